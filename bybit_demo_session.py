@@ -4,12 +4,31 @@ import hashlib
 import hmac
 import json
 import os
+import uuid
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from contextlib import contextmanager
+from resilience import CircuitBreaker, CircuitOpenError, DeadlineExceeded, LatencyTracker
 
 class BybitDemoSession:
-    def __init__(self, api_key, api_secret):
+    def __init__(self, api_key, api_secret, private_stream=None, order_book_stream=None, journal=None):
         self.api_key = api_key
         self.api_secret = api_secret
         self.base_url = "https://api-demo.bybit.com"
+        # Optional BybitPrivateStream; when synced, positions and orders are read from it instead of REST
+        self.private_stream = private_stream
+        # Optional OrderBookStream; when its book is fresh, limit orders are priced passively on the touch
+        self.order_book_stream = order_book_stream
+        # Optional TradeJournal; every order request and response is recorded to it
+        self.journal = journal
+
+        self.http = requests.Session()  # Keep-alive connections instead of a new TLS handshake per call
+        self.request_timeout = float(os.getenv("REQUEST_TIMEOUT", 5))
+        self.order_timeout = float(os.getenv("ORDER_TIMEOUT", 3))
+        self.order_attempts = int(os.getenv("ORDER_ATTEMPTS", 3))
+        self.deadline = None  # monotonic time by which the current iteration must be done
+        self.circuit_breakers = {}
+        self.latency_trackers = {}
+        self._hedge_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="bybit-hedge")
 
     def _generate_signature(self, params):
         param_str = '&'.join([f'{k}={params[k]}' for k in sorted(params)])
@@ -18,23 +37,149 @@ class BybitDemoSession:
     def _get_timestamp(self):
         return str(int(time.time() * 1000))
 
-    def send_request(self, method, endpoint, params=None):
+    @contextmanager
+    def iteration_deadline(self, seconds):
+        """
+        Bounds every request made inside the block to a shared time budget of `seconds`.
+        """
+        self.deadline = time.monotonic() + seconds
+        try:
+            yield
+        finally:
+            self.deadline = None
+
+    def _request_timeout(self, timeout, use_deadline):
+        timeout = timeout or self.request_timeout
+        if use_deadline and self.deadline is not None:
+            remaining = self.deadline - time.monotonic()
+            if remaining <= 0:
+                raise DeadlineExceeded("Iteration deadline exceeded")
+            timeout = min(timeout, remaining)
+        return timeout
+
+    def send_request(self, method, endpoint, params=None, timeout=None, hedge=False, use_deadline=True,
+                     breaker_key=None):
+        """
+        Signs and sends a request through the endpoint's circuit breaker, or the one named
+        `breaker_key` for traffic that must not be blocked by the endpoint's other callers.
+        `hedge=True` (GET only) fires a duplicate request if the first one is slower than
+        the endpoint's recent p95 latency and returns whichever answers first.
+        """
         if params is None:
             params = {}
+        if method not in ("GET", "POST"):
+            raise ValueError("Unsupported HTTP method")
 
+        # Check the deadline first: a half-open breaker hands out its single trial slot in
+        # before_request(), and only the try block below releases it again
+        timeout = self._request_timeout(timeout, use_deadline)
+        breaker_key = breaker_key or endpoint
+        breaker = self.circuit_breakers.setdefault(breaker_key, CircuitBreaker(breaker_key))
+        breaker.before_request()
+        try:
+            if hedge and method == "GET":
+                response = self._send_hedged(endpoint, params, timeout)
+            else:
+                response = self._send_once(method, endpoint, params, timeout)
+        except Exception:
+            breaker.record_failure()
+            raise
+        breaker.record_success()
+        return response
+
+    def _send_once(self, method, endpoint, params, timeout):
+        # Sign a copy so a retried or hedged request gets a fresh timestamp
+        params = dict(params)
         params['api_key'] = self.api_key
         params['timestamp'] = self._get_timestamp()
         params['sign'] = self._generate_signature(params)
 
+        started = time.monotonic()
         if method == "GET":
-            response = requests.get(f"{self.base_url}{endpoint}", params=params)
-        elif method == "POST":
-            response = requests.post(f"{self.base_url}{endpoint}", json=params)
+            response = self.http.get(f"{self.base_url}{endpoint}", params=params, timeout=timeout)
         else:
-            raise ValueError("Unsupported HTTP method")
+            response = self.http.post(f"{self.base_url}{endpoint}", json=params, timeout=timeout)
+        self.latency_trackers.setdefault(endpoint, LatencyTracker()).record(time.monotonic() - started)
 
         return response.json()
 
+    def _send_hedged(self, endpoint, params, timeout):
+        started = time.monotonic()
+        tracker = self.latency_trackers.setdefault(endpoint, LatencyTracker())
+        hedge_delay = min(tracker.percentile(95, default=timeout / 2), timeout)
+
+        futures = {self._hedge_executor.submit(self._send_once, "GET", endpoint, params, timeout)}
+        done, _ = wait(futures, timeout=hedge_delay)
+        if not done or next(iter(done)).exception() is not None:
+            remaining = timeout - (time.monotonic() - started)
+            if remaining > 0:
+                futures.add(self._hedge_executor.submit(self._send_once, "GET", endpoint, params, remaining))
+
+        last_error = None
+        pending = futures
+        while pending:
+            remaining = timeout - (time.monotonic() - started)
+            if remaining <= 0:
+                break
+            done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    return future.result()
+                last_error = future.exception()
+        raise last_error or requests.Timeout(f"GET {endpoint} timed out after {timeout:.2f}s")
+
+    def _create_order(self, order_params):
+        """
+        Sends /v5/order/create with retries that can never double-fill: every attempt carries
+        the same orderLinkId, so if an earlier attempt already reached the exchange the retry
+        is rejected as a duplicate and the existing order is returned instead.
+        Orders get their own timeout rather than the iteration deadline so a signal is not dropped.
+        Reduce-only closes go through their own circuit breaker, so failing entry orders can
+        never block a stop-loss or take-profit close.
+        """
+        endpoint = "/v5/order/create"
+        order_params = dict(order_params)
+        order_params.setdefault("orderLinkId", uuid.uuid4().hex)
+        breaker_key = f"{endpoint}:reduce-only" if order_params.get("reduceOnly") else endpoint
+
+        last_error = None
+        for attempt in range(1, self.order_attempts + 1):
+            try:
+                response = self.send_request("POST", endpoint, order_params, timeout=self.order_timeout,
+                                             use_deadline=False, breaker_key=breaker_key)
+            except (requests.RequestException, ValueError) as e:
+                # Timeouts, connection errors and garbled bodies are retried with the same orderLinkId
+                last_error = e
+                print(f"Order create attempt {attempt} failed: {e}")
+                time.sleep(0.2 * attempt)
+                continue
+
+            if response['retCode'] == 0:
+                return response
+            if response['retCode'] == 110072:  # OrderLinkedID is duplicate: an earlier attempt landed
+                return self._get_order_by_link_id(order_params["symbol"], order_params["orderLinkId"])
+            if response['retCode'] == 110017 and order_params.get("reduceOnly"):
+                # Reduce-only rejected because the position is already zero, e.g. its exchange-side
+                # stop-loss or take-profit fired first: there is nothing left to close
+                return response
+            raise Exception(f"API Error: {response['retMsg']}")
+
+        raise last_error
+
+    def _get_order_by_link_id(self, symbol, order_link_id):
+        params = {
+            "category": "linear",
+            "symbol": symbol,
+            "orderLinkId": order_link_id,
+        }
+        response = self.send_request("GET", "/v5/order/realtime", params, timeout=self.order_timeout,
+                                     use_deadline=False)
+        if response['retCode'] != 0:
+            raise Exception(f"API Error: {response['retMsg']}")
+        orders = response['result']['list']
+        order_id = orders[0]['orderId'] if orders else ''
+        return {"retCode": 0, "retMsg": "OK", "result": {"orderId": order_id, "orderLinkId": order_link_id}}
+
     def get_historical_data(self, symbol, interval, limit):
         try:
             endpoint = "/v5/market/kline"
@@ -44,7 +189,7 @@ class BybitDemoSession:
                 "interval": interval,
                 "limit": limit
             }
-            response = self.send_request("GET", endpoint, params)
+            response = self.send_request("GET", endpoint, params, hedge=True)
             if response['retCode'] != 0:
                 raise Exception(f"API Error: {response['retMsg']}")
             return response['result']['list']
@@ -73,7 +218,6 @@ class BybitDemoSession:
             # Set leverage before placing an order
             self.set_leverage(symbol, leverage=leverage)
 
-            endpoint = "/v5/order/create"
             # Manually set positionIdx based on known position mode:
             # For Hedge Mode: 1 for long (buy), 2 for short (sell)
             # For One-way Mode: 0
@@ -84,8 +228,19 @@ class BybitDemoSession:
             else:  # one_way
                 position_idx = 0
 
-            # Adjust price based on the side of the orderare you st
-            if side.lower() == 'buy':
+            quote = None
+            if self.order_book_stream:
+                quote = self.order_book_stream.quote(symbol, side, qty)
+
+            # Adjust price based on the side of the order
+            if quote:
+                # Join the touch: best bid for a Buy, best ask for a Sell
+                price = quote['best_bid'] if side.lower() == 'buy' else quote['best_ask']
+                slippage = quote['expected_slippage']
+                slippage_str = f"{slippage * 10000:.2f} bps" if slippage is not None else "beyond visible depth"
+                print(f"Order book {symbol}: bid {quote['best_bid']}, ask {quote['best_ask']}, "
+                      f"expected market slippage for {qty}: {slippage_str}. Placing passive limit at {price}.")
+            elif side.lower() == 'buy':
                 # price = current_price * 0.9999  # 0.01% below the current market price
                 price = current_price * 0.9997  # 0.03% below the current market price
                 if stop_loss and stop_loss >= price:
@@ -108,24 +263,46 @@ class BybitDemoSession:
             #     "positionIdx": position_idx,  # Use the positionIdx determined above
             # }
 
-            order_params = {
-                "category": "linear",
-                "symbol": symbol,
-                "side": side,
-                "orderType": "Market",  # Changed to Market order
-                "qty": str(qty),  # Convert quantity to string
-                "positionIdx": position_idx,  # Use the positionIdx determined above
-            }
+            if quote:
+                order_params = {
+                    "category": "linear",
+                    "symbol": symbol,
+                    "side": side,
+                    "orderType": "Limit",
+                    "qty": str(qty),
+                    "price": str(price),
+                    "timeInForce": "PostOnly",  # Rejected instead of crossing if the touch moved
+                    "positionIdx": position_idx,
+                }
+            else:
+                # No live book: fall back to a market order
+                order_params = {
+                    "category": "linear",
+                    "symbol": symbol,
+                    "side": side,
+                    "orderType": "Market",  # Changed to Market order
+                    "qty": str(qty),  # Convert quantity to string
+                    "positionIdx": position_idx,  # Use the positionIdx determined above
+                }
 
             if stop_loss:
                 order_params["stopLoss"] = str(stop_loss)
             if take_profit:
                 order_params["takeProfit"] = str(take_profit)
 
-            response = self.send_request("POST", endpoint, order_params)
-            if response['retCode'] != 0:
-                raise Exception(f"API Error: {response['retMsg']}")
-
+            order_params.setdefault("orderLinkId", uuid.uuid4().hex)
+            if self.journal:
+                self.journal.record(symbol, 'order_request', side=side.lower(), params=order_params)
+            try:
+                response = self._create_order(order_params)
+            except Exception as e:
+                if self.journal:
+                    self.journal.record(symbol, 'order_response', side=side.lower(),
+                                        orderLinkId=order_params["orderLinkId"], error=str(e))
+                raise
+            if self.journal:
+                self.journal.record(symbol, 'order_response', side=side.lower(),
+                                    orderLinkId=order_params["orderLinkId"], result=response['result'])
             return response['result']
         except Exception as e:
             print(f"Error placing order: {e}")
@@ -134,18 +311,52 @@ class BybitDemoSession:
 
 
 
+    def _get_positions(self, symbol):
+        """
+        Returns all positions for the symbol, from the private stream book when it is in sync,
+        otherwise from REST (which also re-seeds the book after a reconnect).
+        """
+        if self.private_stream and self.private_stream.is_synced(symbol):
+            return self.private_stream.get_positions(symbol)
+        generation = self.private_stream.connection_generation() if self.private_stream else None
+
+        endpoint = "/v5/position/list"
+        params = {
+            "category": "linear",
+            "symbol": symbol
+        }
+        response = self.send_request("GET", endpoint, params)
+        if response['retCode'] != 0:
+            raise Exception(f"API Error: {response['retMsg']}")
+
+        positions = response['result']['list']
+        if self.private_stream:
+            self.private_stream.seed_positions(symbol, positions, generation)
+        return positions
+
+    def _get_open_orders(self, symbol):
+        if self.private_stream and self.private_stream.is_synced(symbol):
+            return self.private_stream.get_open_orders(symbol)
+        generation = self.private_stream.connection_generation() if self.private_stream else None
+        requested_at = int(time.time() * 1000)
+
+        endpoint = "/v5/order/realtime"
+        params = {
+            "category": "linear",
+            "symbol": symbol
+        }
+        response = self.send_request("GET", endpoint, params)
+        if response['retCode'] != 0:
+            raise Exception(f"API Error: {response['retMsg']}")
+
+        open_orders = response['result']['list']
+        if self.private_stream:
+            self.private_stream.seed_orders(symbol, open_orders, generation, requested_at)
+        return open_orders
+
     def get_open_positions(self, symbol):
         try:
-            endpoint = "/v5/position/list"
-            params = {
-                "category": "linear",
-                "symbol": symbol
-            }
-            response = self.send_request("GET", endpoint, params)
-            if response['retCode'] != 0:
-                raise Exception(f"API Error: {response['retMsg']}")
-
-            positions = response['result']['list']
+            positions = self._get_positions(symbol)
             active_positions = [pos for pos in positions if float(pos['size']) > 0]
 
             if active_positions:
@@ -164,36 +375,39 @@ class BybitDemoSession:
 
     def get_open_orders(self, symbol):
         try:
-            endpoint = "/v5/order/realtime"
-            params = {
-                "category": "linear",
-                "symbol": symbol
-            }
-            response = self.send_request("GET", endpoint, params)
-            if response['retCode'] != 0:
-                raise Exception(f"API Error: {response['retMsg']}")
-
-            open_orders = response['result']['list']
-            current_time = time.time()
-            orders_to_cancel = []
-
-            for order in open_orders:
-                created_time = int(order['createdTime']) / 1000
-                if current_time - created_time > 180:  # 180 seconds = 3 minutes
-                    orders_to_cancel.append(order)
-
-            if orders_to_cancel:
-                for order in orders_to_cancel:
-                    self.cancel_order(order['orderId'], symbol)
-                    print(f"Order {order['orderId']} cancelled as it was older than 3 minutes.")
-            else:
-                print("No orders older than 3 minutes.")
-
+            open_orders = self._get_open_orders(symbol)
+            self._cancel_orders_older_than(open_orders, symbol, 180)
             return open_orders
         except Exception as e:
             print(f"Ошибка при получении лимитных ордеров: {e}")
             return None
 
+    def cancel_stale_orders(self, symbol, max_age=180):
+        """
+        Cancels open orders older than `max_age` seconds (3 minutes by default).
+        Meant to run on a timer; reads the private stream book when it is in sync.
+        """
+        try:
+            self._cancel_orders_older_than(self._get_open_orders(symbol), symbol, max_age)
+        except Exception as e:
+            print(f"Ошибка при получении лимитных ордеров: {e}")
+
+    def _cancel_orders_older_than(self, open_orders, symbol, max_age):
+        current_time = time.time()
+        orders_to_cancel = []
+
+        for order in open_orders:
+            created_time = int(order['createdTime']) / 1000
+            if current_time - created_time > max_age:
+                orders_to_cancel.append(order)
+
+        if orders_to_cancel:
+            for order in orders_to_cancel:
+                self.cancel_order(order['orderId'], symbol)
+                print(f"Order {order['orderId']} cancelled as it was older than {max_age} seconds.")
+        else:
+            print(f"No orders older than {max_age} seconds.")
+
     def cancel_order(self, order_id, symbol):
         try:
             endpoint = "/v5/order/cancel"
@@ -211,16 +425,7 @@ class BybitDemoSession:
 
     def get_last_closed_position(self, symbol):
         try:
-            endpoint = "/v5/position/list"
-            params = {
-                "category": "linear",
-                "symbol": symbol
-            }
-            response = self.send_request("GET", endpoint, params)
-            if response['retCode'] != 0:
-                raise Exception(f"API Error: {response['retMsg']}")
-
-            positions = response['result']['list']
+            positions = self._get_positions(symbol)
             closed_positions = [pos for pos in positions if float(pos['size']) == 0]
 
             if closed_positions:
@@ -240,7 +445,7 @@ class BybitDemoSession:
                 "category": "linear",
                 "symbol": symbol
             }
-            response = self.send_request("GET", endpoint, params)
+            response = self.send_request("GET", endpoint, params, hedge=True)
             if response['retCode'] != 0:
                 raise Exception(f"API Error: {response['retMsg']}")
             return float(response['result']['list'][0]['lastPrice'])
@@ -251,7 +456,6 @@ class BybitDemoSession:
     def close_position(self, symbol, size):
         try:
             # Assuming we are in hedge mode; if not, update as needed.
-            endpoint = "/v5/order/create"
             side = "Sell" if size > 0 else "Buy"  # Reverse side to close position
 
             params = {
@@ -260,14 +464,38 @@ class BybitDemoSession:
                 "side": side,
                 "orderType": "Market",
                 "qty": str(abs(size)),
+                "positionIdx": 0,  # Use 0 for one-way mode, 1 or 2 for hedge mode
+                "reduceOnly": True  # Never open a reverse position if it was already closed by the exchange
+            }
+
+            response = self._create_order(params)
+            if response['retCode'] != 0:
+                print(f"Position {symbol} was already closed: {response['retMsg']}")
+            else:
+                print(f"Position closed successfully: {response}")
+            return response
+        except Exception as e:
+            print(f"Error closing position: {e}")
+            return None
+
+    def set_trading_stop(self, symbol, stop_loss=None, take_profit=None):
+        try:
+            endpoint = "/v5/position/trading-stop"
+            params = {
+                "category": "linear",
+                "symbol": symbol,
+                "tpslMode": "Full",
                 "positionIdx": 0  # Use 0 for one-way mode, 1 or 2 for hedge mode
             }
+            if stop_loss:
+                params["stopLoss"] = str(stop_loss)
+            if take_profit:
+                params["takeProfit"] = str(take_profit)
 
-            response = self.send_request("POST", endpoint, params)
+            response = self.send_request("POST", endpoint, params, use_deadline=False)
             if response['retCode'] != 0:
                 raise Exception(f"API Error: {response['retMsg']}")
-            print(f"Position closed successfully: {response}")
             return response
         except Exception as e:
-            print(f"Error closing position: {e}")
-            return None
\ No newline at end of file
+            print(f"Error setting trading stop: {e}")
+            return None
@@ -0,0 +1,226 @@
+# bybit_private_stream.py
+
+import collections
+import hashlib
+import hmac
+import json
+import logging
+import threading
+import time
+
+
+class BybitPrivateStream:
+    """
+    Authenticated Bybit v5 private WebSocket client for the `position`, `order`
+    and `execution` topics. Keeps an in-memory book of positions and open orders
+    that BybitDemoSession reads instead of polling the REST endpoints.
+
+    The book is only trusted while `is_synced(symbol)` is True: that requires a live,
+    authenticated connection and a REST seed taken after that connection came up
+    (Bybit does not replay the current state on subscribe).
+    """
+
+    OPEN_ORDER_STATUSES = {"New", "PartiallyFilled", "Untriggered"}
+
+    def __init__(self, api_key, api_secret, url="wss://stream-demo.bybit.com/v5/private",
+                 ping_interval=20, reconnect_delay=5):
+        self.api_key = api_key
+        self.api_secret = api_secret
+        self.url = url
+        self.ping_interval = ping_interval
+        self.reconnect_delay = reconnect_delay
+
+        self.positions = {}  # (symbol, positionIdx) -> position
+        self.orders = {}  # orderId -> open order
+        self.executions = collections.deque(maxlen=200)
+
+        self._lock = threading.Lock()
+        self._ws = None
+        self._connected = False
+        self._generation = 0  # bumped every time a connection becomes live
+        self._positions_seeded = set()  # symbols whose positions were seeded from REST
+        self._orders_seeded = set()
+        self._running = False
+        self._position_listeners = []
+
+    def _auth_message(self):
+        expires = int((time.time() + 10) * 1000)
+        signature = hmac.new(self.api_secret.encode('utf-8'), f"GET/realtime{expires}".encode('utf-8'),
+                             hashlib.sha256).hexdigest()
+        return {"op": "auth", "args": [self.api_key, expires, signature]}
+
+    def add_position_listener(self, callback):
+        """
+        Registers `callback(position)`, called on the stream thread for every position update
+        that is newer than the book's copy.
+        """
+        self._position_listeners.append(callback)
+
+    def start(self):
+        self._running = True
+        threading.Thread(target=self._run_forever, name="bybit-private-stream", daemon=True).start()
+
+    def stop(self):
+        self._running = False
+        if self._ws:
+            self._ws.close()
+
+    def _run_forever(self):
+        import websocket  # Deferred: only needed once the stream is actually started
+
+        while self._running:
+            self._ws = websocket.WebSocketApp(
+                self.url,
+                on_open=self._on_open,
+                on_message=self._on_message,
+                on_error=self._on_error,
+                on_close=self._on_close,
+            )
+            try:
+                # Bybit expects an application-level {"op": "ping"} rather than a WS ping frame
+                threading.Thread(target=self._ping_loop, args=(self._ws,), daemon=True).start()
+                self._ws.run_forever()
+            except Exception as e:
+                logging.error(f"Private stream error: {e}")
+            self._mark_disconnected()
+            if self._running:
+                logging.warning(f"Private stream disconnected. Reconnecting in {self.reconnect_delay}s...")
+                time.sleep(self.reconnect_delay)
+
+    def _ping_loop(self, ws):
+        while self._running and self._ws is ws:
+            time.sleep(self.ping_interval)
+            try:
+                if ws.sock and ws.sock.connected:
+                    ws.send(json.dumps({"op": "ping"}))
+            except Exception:
+                return
+
+    def _on_open(self, ws):
+        ws.send(json.dumps(self._auth_message()))
+
+    def _on_error(self, ws, error):
+        logging.error(f"Private stream error: {error}")
+
+    def _on_close(self, ws, status_code, message):
+        self._mark_disconnected()
+
+    def _mark_disconnected(self):
+        with self._lock:
+            # Updates may have been missed while offline, so the book needs a new REST seed
+            self._connected = False
+            self._positions_seeded.clear()
+            self._orders_seeded.clear()
+
+    def _on_message(self, ws, message):
+        msg = json.loads(message)
+
+        if msg.get("op") == "auth":
+            if msg.get("success"):
+                ws.send(json.dumps({"op": "subscribe", "args": ["position", "order", "execution"]}))
+            else:
+                logging.error(f"Private stream authentication failed: {msg.get('ret_msg')}")
+            return
+        if msg.get("op") == "subscribe":
+            if msg.get("success"):
+                with self._lock:
+                    self._connected = True
+                    self._generation += 1
+                logging.info("Private stream subscribed to position, order and execution topics.")
+            else:
+                logging.error(f"Private stream subscription failed: {msg.get('ret_msg')}")
+            return
+
+        topic = msg.get("topic")
+        data = msg.get("data", [])
+        updated = []
+        with self._lock:
+            if topic == "position":
+                updated = [position for position in data if self._apply_position(position)]
+            elif topic == "order":
+                for order in data:
+                    self._apply_order(order)
+            elif topic == "execution":
+                self.executions.extend(data)
+
+        for position in updated:
+            for callback in self._position_listeners:
+                try:
+                    callback(dict(position))
+                except Exception as e:
+                    logging.error(f"Position listener error: {e}")
+
+    @staticmethod
+    def _is_newer(new, old):
+        return old is None or int(new.get("updatedTime") or 0) >= int(old.get("updatedTime") or 0)
+
+    def _apply_position(self, position):
+        key = (position["symbol"], int(position.get("positionIdx", 0)))
+        if self._is_newer(position, self.positions.get(key)):
+            self.positions[key] = position
+            return True
+        return False
+
+    def _apply_order(self, order):
+        current = self.orders.get(order["orderId"])
+        if not self._is_newer(order, current):
+            return
+        if order.get("orderStatus") in self.OPEN_ORDER_STATUSES:
+            self.orders[order["orderId"]] = order
+        else:
+            self.orders.pop(order["orderId"], None)
+
+    def is_synced(self, symbol):
+        with self._lock:
+            return self._connected and symbol in self._positions_seeded and symbol in self._orders_seeded
+
+    def connection_generation(self):
+        """
+        Returns an id for the current live connection, or None while disconnected.
+        Take it before sending the REST request that will seed the book.
+        """
+        with self._lock:
+            return self._generation if self._connected else None
+
+    def _still_connected(self, generation):
+        # The REST request was sent while this same connection was already live,
+        # so every change after the REST snapshot also reached the stream
+        return generation is not None and self._connected and generation == self._generation
+
+    def seed_positions(self, symbol, positions, generation):
+        """
+        Seeds the position book from a REST /v5/position/list response.
+        `generation` is connection_generation() taken before the request was sent; the symbol only
+        counts as synced if that connection is still the live one.
+        """
+        with self._lock:
+            for position in positions:
+                self._apply_position(position)
+            if self._still_connected(generation):
+                self._positions_seeded.add(symbol)
+
+    def seed_orders(self, symbol, orders, generation, requested_at):
+        """
+        Seeds the order book for `symbol` from a REST /v5/order/realtime response.
+        `requested_at` is the time (ms) the request was sent: book orders missing from the
+        response are only dropped if they were last updated before it, since the stream may
+        have applied newer ones while the request was in flight.
+        """
+        with self._lock:
+            rest_ids = {order["orderId"] for order in orders}
+            for order_id, order in list(self.orders.items()):
+                if order["symbol"] == symbol and order_id not in rest_ids \
+                        and int(order.get("updatedTime") or 0) < requested_at:
+                    del self.orders[order_id]
+            for order in orders:
+                self._apply_order(order)
+            if self._still_connected(generation):
+                self._orders_seeded.add(symbol)
+
+    def get_positions(self, symbol):
+        with self._lock:
+            return [dict(pos) for (pos_symbol, _), pos in self.positions.items() if pos_symbol == symbol]
+
+    def get_open_orders(self, symbol):
+        with self._lock:
+            return [dict(order) for order in self.orders.values() if order["symbol"] == symbol]
@@ -0,0 +1,281 @@
+# monte_carlo.py
+
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+
+def _atr(high, low, close, period):
+    """
+    Simple-moving-average ATR, matching RiskManagement.calculate_atr.
+    """
+    previous_close = np.concatenate(([np.nan], close[:-1]))
+    tr = np.nanmax(np.vstack([
+        high - low,
+        np.abs(high - previous_close),
+        np.abs(low - previous_close),
+    ]), axis=0)
+    atr = np.full_like(close, np.nan)
+    cumsum = np.cumsum(np.insert(tr, 0, 0.0))
+    atr[period - 1:] = (cumsum[period:] - cumsum[:-period]) / period
+    return atr
+
+
+def _ema(values, span):
+    alpha = 2 / (span + 1)
+    ema = np.empty_like(values)
+    ema[0] = values[0]
+    for i in range(1, len(values)):
+        ema[i] = alpha * values[i] + (1 - alpha) * ema[i - 1]
+    return ema
+
+
+def _rolling_mean(values, window):
+    mean = np.full_like(values, np.nan)
+    cumsum = np.cumsum(np.insert(values, 0, 0.0))
+    mean[window - 1:] = (cumsum[window:] - cumsum[:-window]) / window
+    return mean
+
+
+def _confirmation_signals(close):
+    """
+    Per-bar direction of Strategies.rsi_bollinger_macd_confirmation under the EMA-90/EMA-200
+    trend: +1 buy, -1 sell, 0 no signal. Uses the bar's close as the current price.
+    """
+    uptrend = _ema(close, 90) > _ema(close, 200)
+
+    delta = np.diff(close, prepend=np.nan)
+    gain = _rolling_mean(np.where(delta > 0, delta, 0.0), 14)
+    loss = _rolling_mean(np.where(delta < 0, -delta, 0.0), 14)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rsi = 100 - 100 / (1 + gain / loss)
+
+    # Bollinger Bands (20, 2), sample std like pandas' rolling().std()
+    middle = _rolling_mean(close, 20)
+    std = np.full_like(close, np.nan)
+    std[19:] = np.lib.stride_tricks.sliding_window_view(close, 20).std(axis=1, ddof=1)
+    upper, lower = middle + 2 * std, middle - 2 * std
+
+    buy = uptrend & ((rsi < 35) | (close < lower))
+    sell = ~uptrend & ((rsi > 65) | (close > upper))
+    return np.where(buy, 1, np.where(sell, -1, 0))
+
+
+def _trade_returns(candles, entries, directions, stop_loss_percentage, atr_multiplier, leverage,
+                   maintenance_margin, atr_period, horizon):
+    """
+    Resolves every entry against the following `horizon` bars, all entries at once.
+    Returns the kept entries, their per-trade price return (positive = profit), entry
+    price and exit bar. Entries without a defined ATR are dropped.
+    The liquidation price (1 / leverage - maintenance margin away from the entry) acts as
+    an extra stop: if it is nearer than the stop-loss it is hit first and the whole
+    margin (a return of -1 / leverage) is lost.
+    A bar that touches both the stop and the take-profit is counted as a stop (conservative).
+    Trades that hit neither level are closed at the last bar's close.
+    """
+    high, low, close = candles[:, 0], candles[:, 1], candles[:, 2]
+    atr = _atr(high, low, close, atr_period)
+
+    # Entries before the first full ATR window have no take-profit level; skip them
+    has_atr = ~np.isnan(atr[entries])
+    entries, directions = entries[has_atr], directions[has_atr]
+
+    entry_price = close[entries]
+    is_long = directions > 0
+    sl_distance = stop_loss_percentage / 100 * entry_price
+    liquidation_distance = max(1 / leverage - maintenance_margin, 0) * entry_price
+    liquidated = liquidation_distance < sl_distance
+    stop_distance = np.minimum(sl_distance, liquidation_distance)
+    tp_distance = atr[entries] * atr_multiplier
+    stop = np.where(is_long, entry_price - stop_distance, entry_price + stop_distance)
+    take_profit = np.where(is_long, entry_price + tp_distance, entry_price - tp_distance)
+
+    window = entries[:, None] + np.arange(1, horizon + 1)
+    window_high, window_low = high[window], low[window]
+
+    hit_stop = np.where(is_long[:, None], window_low <= stop[:, None], window_high >= stop[:, None])
+    hit_tp = np.where(is_long[:, None], window_high >= take_profit[:, None], window_low <= take_profit[:, None])
+
+    # Index of the first hit, or `horizon` if the level is never reached
+    first_stop = np.where(hit_stop.any(axis=1), hit_stop.argmax(axis=1), horizon)
+    first_tp = np.where(hit_tp.any(axis=1), hit_tp.argmax(axis=1), horizon)
+    stopped = (first_stop <= first_tp) & (first_stop < horizon)
+
+    exit_price = close[window[:, -1]]
+    exit_price = np.where(first_tp < horizon, take_profit, exit_price)
+    exit_price = np.where(stopped, stop, exit_price)
+    returns = directions * (exit_price - entry_price) / entry_price
+    returns = np.where(stopped & liquidated, -1 / leverage, returns)
+
+    exit_bar = entries + 1 + np.minimum(np.minimum(first_stop, first_tp), horizon - 1)
+    return entries, returns, entry_price, exit_bar
+
+
+def _one_at_a_time(entries, exit_bar, cooldown_bars):
+    """
+    Indices of the trades the bot would actually take: a signal is skipped while the
+    previous trade is open or within `cooldown_bars` of its exit.
+    """
+    taken = []
+    free_from = -1
+    for i, entry in enumerate(entries):
+        if entry > free_from:
+            taken.append(i)
+            free_from = exit_bar[i] + cooldown_bars
+    return np.array(taken, dtype=int)
+
+
+def _simulate_setting(args):
+    (candles, entries, directions, stop_loss_percentage, atr_multiplier, leverage, quantity,
+     balance, n_paths, n_trades, atr_period, horizon, maintenance_margin, cooldown_bars,
+     batch_size, seed) = args
+
+    entries, returns, entry_price, exit_bar = _trade_returns(
+        candles, entries, directions, stop_loss_percentage, atr_multiplier, leverage,
+        maintenance_margin, atr_period, horizon)
+    taken = _one_at_a_time(entries, exit_bar, cooldown_bars)
+    if len(taken) == 0:
+        return None
+    returns, entry_price = returns[taken], entry_price[taken]
+
+    pnl = quantity * entry_price * returns
+    margin = quantity * entry_price / leverage
+
+    rng = np.random.default_rng(seed)
+    max_drawdowns = np.empty(n_paths)
+    final_equity = np.empty(n_paths)
+    ruined = np.empty(n_paths, dtype=bool)
+
+    for start in range(0, n_paths, batch_size):
+        stop = min(start + batch_size, n_paths)
+        picks = rng.integers(0, len(pnl), size=(stop - start, n_trades))
+        trade_pnl = pnl[picks]
+        equity = balance + np.cumsum(trade_pnl, axis=1)
+        # Ruin: the account can no longer post the margin for its next trade. Equity only
+        # changes through trades, so it is correct up to the first such trade; from there
+        # the path stops trading and its equity is frozen.
+        equity_before = np.concatenate((np.full((stop - start, 1), balance), equity[:, :-1]), axis=1)
+        blocked = np.logical_or.accumulate(equity_before < margin[picks], axis=1)
+        equity = balance + np.cumsum(np.where(blocked, 0.0, trade_pnl), axis=1)
+
+        peak = np.maximum.accumulate(np.maximum(equity, balance), axis=1)
+        max_drawdowns[start:stop] = ((peak - equity) / peak).max(axis=1)
+        final_equity[start:stop] = equity[:, -1]
+        ruined[start:stop] = blocked[:, -1]
+
+    return {
+        "stop_loss_percentage": stop_loss_percentage,
+        "atr_multiplier": atr_multiplier,
+        "leverage": leverage,
+        "quantity": quantity,
+        "trades": len(pnl),
+        "win_rate": float((pnl > 0).mean()),
+        "expectancy": float(pnl.mean()),
+        "risk_of_ruin": float(ruined.mean()),
+        "drawdown_median": float(np.median(max_drawdowns)),
+        "drawdown_p95": float(np.percentile(max_drawdowns, 95)),
+        "drawdown_p99": float(np.percentile(max_drawdowns, 99)),
+        "final_equity_median": float(np.median(final_equity)),
+    }
+
+
+class MonteCarloSimulator:
+    """
+    Bootstraps sequences of historical trades to see how RiskManagement settings
+    (stop-loss %, ATR multiplier, leverage, quantity) behave across many paths.
+    Each setting is evaluated in a separate process; paths within a setting are
+    simulated in vectorized batches.
+    """
+
+    def __init__(self, balance=1000.0, n_paths=20000, n_trades=100, atr_period=14, horizon=96,
+                 maintenance_margin=0.005, cooldown_bars=20, batch_size=5000, workers=None, seed=None):
+        self.balance = balance
+        self.n_paths = n_paths
+        self.n_trades = n_trades
+        self.atr_period = atr_period
+        self.horizon = horizon  # bars a trade may stay open (96 x M15 = 24h)
+        self.maintenance_margin = maintenance_margin  # fraction of notional, Bybit's base MMR for BTCUSDT
+        self.cooldown_bars = cooldown_bars  # the bot's 5h cooldown after a close (20 x M15)
+        self.batch_size = batch_size
+        self.workers = workers or os.cpu_count()
+        self.seed = seed
+
+    @staticmethod
+    def candles_to_array(historical_data):
+        """
+        Converts Bybit kline rows (newest first) into a chronological float array of high, low, close.
+        """
+        rows = sorted(historical_data, key=lambda c: int(c[0]))
+        return np.array([[float(c[2]), float(c[3]), float(c[4])] for c in rows])
+
+    def default_entries(self, candles):
+        """
+        Every bar from 200 on where the bot's entry rule (EMA trend + rsi_bollinger_macd_confirmation)
+        signals. run() then takes them one at a time with the cooldown, as the bot would.
+        """
+        signals = _confirmation_signals(candles[:, 2])
+        entries = np.flatnonzero(signals[:len(candles) - self.horizon])
+        entries = entries[entries >= 200]
+        return entries, signals[entries]
+
+    def run(self, candles, stop_loss_percentages, atr_multipliers, leverages, quantities,
+            entries=None, directions=None):
+        """
+        Evaluates every combination of the given settings.
+        `entries` are bar indices into `candles`, `directions` are +1 (long) / -1 (short); by default
+        the bot's own signals. Overlapping entries are skipped: one trade at a time, then the cooldown.
+        Returns a list of result dicts, one per setting.
+        """
+        if entries is None:
+            entries, directions = self.default_entries(candles)
+        order = np.argsort(entries, kind="stable")
+        entries = np.asarray(entries)[order]
+        directions = np.asarray(directions)[order]
+        keep = entries + self.horizon < len(candles)
+        entries, directions = entries[keep], directions[keep]
+        if len(entries) == 0:
+            raise ValueError("Not enough candles after the entries to resolve any trade")
+
+        settings = itertools.product(stop_loss_percentages, atr_multipliers, leverages, quantities)
+        tasks = [
+            (candles, entries, directions, sl, mult, lev, qty, self.balance, self.n_paths,
+             self.n_trades, self.atr_period, self.horizon, self.maintenance_margin, self.cooldown_bars,
+             self.batch_size,
+             None if self.seed is None else self.seed + i)
+            for i, (sl, mult, lev, qty) in enumerate(settings)
+        ]
+
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            results = list(executor.map(_simulate_setting, tasks))
+        return [result for result in results if result is not None]
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+    from bybit_demo_session import BybitDemoSession
+
+    load_dotenv()
+    session = BybitDemoSession(os.getenv("BYBIT_API_KEY"), os.getenv("BYBIT_API_SECRET"))
+    symbol = os.getenv("TRADING_SYMBOL", 'BTCUSDT')
+    historical_data = session.get_historical_data(symbol, '15', 1000)
+    if not historical_data:
+        raise SystemExit("Failed to fetch historical data.")
+
+    simulator = MonteCarloSimulator(balance=float(os.getenv("SIMULATION_BALANCE", 1000)))
+    results = simulator.run(
+        simulator.candles_to_array(historical_data),
+        stop_loss_percentages=[1.0, 2.0, 3.0, float(os.getenv("STOP_LOSS_PERCENTAGE", 5.0))],
+        atr_multipliers=[1.0, 1.5, 2.0, 3.0],
+        leverages=[5, 10, 20],
+        quantities=[float(os.getenv("TRADE_QUANTITY", 0.03))],
+    )
+
+    results.sort(key=lambda r: r["expectancy"], reverse=True)
+    print(f"{'SL%':>5} {'ATRx':>5} {'Lev':>4} {'Qty':>7} {'Trades':>6} {'Win%':>6} {'Expect':>9} "
+          f"{'Ruin%':>6} {'DDmed':>6} {'DD95':>6} {'DD99':>6}")
+    for r in results:
+        print(f"{r['stop_loss_percentage']:>5} {r['atr_multiplier']:>5} {r['leverage']:>4} {r['quantity']:>7} {r['trades']:>6} "
+              f"{r['win_rate'] * 100:>6.1f} {r['expectancy']:>9.3f} {r['risk_of_ruin'] * 100:>6.2f} "
+              f"{r['drawdown_median'] * 100:>6.1f} {r['drawdown_p95'] * 100:>6.1f} {r['drawdown_p99'] * 100:>6.1f}")
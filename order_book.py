@@ -0,0 +1,220 @@
+# order_book.py
+
+import bisect
+import json
+import logging
+import threading
+import time
+
+
+class OrderBook:
+    """
+    In-memory L2 order book for one symbol, maintained from Bybit
+    `orderbook.<depth>.<symbol>` snapshot and delta messages.
+
+    Each side is a price -> size dict plus a sorted list of its prices, so the
+    touch is an O(1) lookup and a level insert/delete is a bisect on a list
+    that is at most `depth` long.
+    """
+
+    def __init__(self, symbol):
+        self.symbol = symbol
+        self.bids = {}
+        self.asks = {}
+        self._bid_prices = []  # ascending, best bid is the last element
+        self._ask_prices = []  # ascending, best ask is the first element
+        self.update_id = 0
+        self.updated_at = 0
+
+    def apply_snapshot(self, data):
+        self.bids = {float(p): float(q) for p, q in data.get("b", []) if float(q) > 0}
+        self.asks = {float(p): float(q) for p, q in data.get("a", []) if float(q) > 0}
+        self._bid_prices = sorted(self.bids)
+        self._ask_prices = sorted(self.asks)
+        self.update_id = data.get("u", 0)
+        self.updated_at = time.time()
+
+    def apply_delta(self, data):
+        update_id = data.get("u", 0)
+        if update_id == 1:
+            # Bybit restarts the sequence with u=1 after a service restart; the message is a full book
+            self.apply_snapshot(data)
+            return
+        if update_id <= self.update_id:
+            return
+        for price, size in data.get("b", []):
+            self._update_level(self.bids, self._bid_prices, float(price), float(size))
+        for price, size in data.get("a", []):
+            self._update_level(self.asks, self._ask_prices, float(price), float(size))
+        self.update_id = update_id
+        self.updated_at = time.time()
+
+    @staticmethod
+    def _update_level(levels, prices, price, size):
+        if size == 0:
+            if levels.pop(price, None) is not None:
+                del prices[bisect.bisect_left(prices, price)]
+        else:
+            if price not in levels:
+                bisect.insort(prices, price)
+            levels[price] = size
+
+    def best_bid(self):
+        return self._bid_prices[-1] if self._bid_prices else None
+
+    def best_ask(self):
+        return self._ask_prices[0] if self._ask_prices else None
+
+    def mid_price(self):
+        bid, ask = self.best_bid(), self.best_ask()
+        if bid is None or ask is None:
+            return None
+        return (bid + ask) / 2
+
+    def is_fresh(self, max_age=5):
+        return bool(self._bid_prices and self._ask_prices) and time.time() - self.updated_at < max_age
+
+    def expected_fill_price(self, side, qty):
+        """
+        Walks the opposite side of the book and returns the average fill price of a
+        market order of `qty`, or None if the visible depth cannot fill it.
+        """
+        if side.lower() == 'buy':
+            prices, levels = self._ask_prices, self.asks
+        else:
+            prices, levels = reversed(self._bid_prices), self.bids
+
+        remaining = qty
+        cost = 0.0
+        for price in prices:
+            take = min(remaining, levels[price])
+            cost += take * price
+            remaining -= take
+            if remaining <= 0:
+                return cost / qty
+        return None
+
+    def expected_slippage(self, side, qty):
+        """
+        Expected slippage of a market order of `qty` against the mid price, as a fraction (0.0005 = 5 bps).
+        """
+        fill_price = self.expected_fill_price(side, qty)
+        mid = self.mid_price()
+        if fill_price is None or mid is None:
+            return None
+        return (fill_price - mid) / mid if side.lower() == 'buy' else (mid - fill_price) / mid
+
+
+class OrderBookStream:
+    """
+    Public WebSocket client that keeps an OrderBook per symbol up to date.
+    """
+
+    def __init__(self, symbols, depth=50, url="wss://stream.bybit.com/v5/public/linear",
+                 ping_interval=20, reconnect_delay=5):
+        self.depth = depth
+        self.url = url
+        self.ping_interval = ping_interval
+        self.reconnect_delay = reconnect_delay
+        self.books = {symbol: OrderBook(symbol) for symbol in symbols}
+        self._lock = threading.Lock()
+        self._ws = None
+        self._running = False
+        self._listeners = []
+
+    def add_listener(self, callback):
+        """
+        Registers `callback(symbol, best_bid, best_ask)`, called on the stream thread after every book update.
+        """
+        self._listeners.append(callback)
+
+    def start(self):
+        self._running = True
+        threading.Thread(target=self._run_forever, name="bybit-orderbook-stream", daemon=True).start()
+
+    def stop(self):
+        self._running = False
+        if self._ws:
+            self._ws.close()
+
+    def _run_forever(self):
+        import websocket
+
+        while self._running:
+            self._ws = websocket.WebSocketApp(
+                self.url,
+                on_open=self._on_open,
+                on_message=self._on_message,
+                on_error=self._on_error,
+            )
+            try:
+                threading.Thread(target=self._ping_loop, args=(self._ws,), daemon=True).start()
+                self._ws.run_forever()
+            except Exception as e:
+                logging.error(f"Order book stream error: {e}")
+            if self._running:
+                logging.warning(f"Order book stream disconnected. Reconnecting in {self.reconnect_delay}s...")
+                time.sleep(self.reconnect_delay)
+
+    def _ping_loop(self, ws):
+        while self._running and self._ws is ws:
+            time.sleep(self.ping_interval)
+            try:
+                if ws.sock and ws.sock.connected:
+                    ws.send(json.dumps({"op": "ping"}))
+            except Exception:
+                return
+
+    def _on_open(self, ws):
+        topics = [f"orderbook.{self.depth}.{symbol}" for symbol in self.books]
+        ws.send(json.dumps({"op": "subscribe", "args": topics}))
+
+    def _on_error(self, ws, error):
+        logging.error(f"Order book stream error: {error}")
+
+    def _on_message(self, ws, message):
+        msg = json.loads(message)
+        topic = msg.get("topic", "")
+        if not topic.startswith("orderbook."):
+            return
+
+        data = msg["data"]
+        book = self.books.get(data.get("s"))
+        if book is None:
+            return
+        with self._lock:
+            if msg.get("type") == "snapshot":
+                book.apply_snapshot(data)
+            else:
+                book.apply_delta(data)
+            best_bid, best_ask = book.best_bid(), book.best_ask()
+        for callback in self._listeners:
+            try:
+                callback(book.symbol, best_bid, best_ask)
+            except Exception as e:
+                logging.error(f"Order book listener error: {e}")
+
+    def get_book(self, symbol, max_age=5):
+        """
+        Returns the symbol's book if it has both sides and was updated within `max_age` seconds.
+        """
+        book = self.books.get(symbol)
+        if book is None or not book.is_fresh(max_age):
+            return None
+        return book
+
+    def quote(self, symbol, side, qty, max_age=5):
+        """
+        Consistent read of touch and expected slippage for an order, or None if the book is stale.
+        """
+        with self._lock:
+            book = self.get_book(symbol, max_age)
+            if book is None:
+                return None
+            return {
+                "best_bid": book.best_bid(),
+                "best_ask": book.best_ask(),
+                "mid_price": book.mid_price(),
+                "expected_fill_price": book.expected_fill_price(side, qty),
+                "expected_slippage": book.expected_slippage(side, qty),
+            }
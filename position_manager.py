@@ -0,0 +1,236 @@
+# position_manager.py
+
+import heapq
+import itertools
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class ManagedPosition:
+    def __init__(self, position_id, symbol, side, size, entry_price, stop_loss, take_profit, trail_distance):
+        self.position_id = position_id
+        self.symbol = symbol
+        self.side = side
+        self.size = size
+        self.entry_price = entry_price
+        # +1 for long, -1 for short. Prices are stored multiplied by it ("long space"),
+        # so a short's stop (price >= stop) becomes the same check as a long's (price <= stop).
+        self.direction = 1 if side.lower() == 'buy' else -1
+        self.stop = stop_loss * self.direction if stop_loss else None
+        self.target = take_profit * self.direction if take_profit else None
+        self.trail_distance = trail_distance
+        self.peak = entry_price * self.direction
+        self.exchange_stop = self.stop  # last stop pushed to the exchange
+        self.version = 0
+        self.close_attempts = 0
+
+    @property
+    def stop_loss(self):
+        return self.stop * self.direction if self.stop is not None else None
+
+    @property
+    def take_profit(self):
+        return self.target * self.direction if self.target is not None else None
+
+
+class _SideBook:
+    """
+    Trigger index for all positions of one symbol and direction, in long-space prices.
+    Three heaps with lazy deletion (entries carry the position version they were pushed for):
+      - stops: max-heap, triggered while price <= top
+      - targets: min-heap, triggered while price >= top
+      - peaks: min-heap of trailing positions' best price, popped while price > top
+    Each tick therefore only touches positions that trigger or whose trailing stop moves.
+    Superseded entries that never reach the top (e.g. a long's older, lower trailing stops)
+    are dropped by rebuilding the heaps once they outnumber the live positions.
+    """
+
+    COMPACT_FACTOR = 4  # rebuild once a heap holds this many entries per live position
+    COMPACT_MIN_SIZE = 64
+
+    def __init__(self):
+        self.stops = []
+        self.targets = []
+        self.peaks = []
+        self.live = {}  # position_id -> position currently indexed here
+        self._counter = itertools.count()
+
+    def push(self, position):
+        self.live[position.position_id] = position
+        if position.stop is not None:
+            heapq.heappush(self.stops, (-position.stop, next(self._counter), position, position.version))
+        if position.target is not None:
+            heapq.heappush(self.targets, (position.target, next(self._counter), position, position.version))
+        if position.trail_distance:
+            heapq.heappush(self.peaks, (position.peak, next(self._counter), position, position.version))
+        self._maybe_compact()
+
+    def _maybe_compact(self):
+        limit = max(self.COMPACT_MIN_SIZE, self.COMPACT_FACTOR * len(self.live))
+        for heap in (self.stops, self.targets, self.peaks):
+            if len(heap) > limit:
+                # Keep only entries for the current version of a live position; O(n) but amortised
+                # over the >= (factor - 1) * n pushes needed to reach the limit again
+                heap[:] = [entry for entry in heap
+                           if entry[3] == entry[2].version and self.live.get(entry[2].position_id) is entry[2]]
+                heapq.heapify(heap)
+
+    @staticmethod
+    def _top(heap):
+        # Drop entries made stale by a later update or removal
+        while heap and heap[0][2].version != heap[0][3]:
+            heapq.heappop(heap)
+        return heap[0] if heap else None
+
+    def on_price(self, price):
+        """
+        Returns (trailed, triggered): positions whose trailing stop moved, and
+        (position, reason) pairs whose stop or target was hit at `price` (long space).
+        """
+        trailed = []
+        top = self._top(self.peaks)
+        while top and top[0] < price:
+            position = top[2]
+            position.peak = price
+            new_stop = price - position.trail_distance
+            position.version += 1
+            if position.stop is None or new_stop > position.stop:
+                position.stop = new_stop
+                trailed.append(position)
+            self.push(position)
+            top = self._top(self.peaks)
+
+        triggered = []
+        top = self._top(self.stops)
+        while top and price <= -top[0]:
+            triggered.append((top[2], 'stop_loss'))
+            self.remove(top[2])
+            top = self._top(self.stops)
+        top = self._top(self.targets)
+        while top and price >= top[0]:
+            triggered.append((top[2], 'take_profit'))
+            self.remove(top[2])
+            top = self._top(self.targets)
+        return trailed, triggered
+
+    def remove(self, position):
+        # Bumping the version invalidates every heap entry for it
+        position.version += 1
+        if self.live.get(position.position_id) is position:
+            del self.live[position.position_id]
+
+
+class PositionManager:
+    """
+    Local, event-driven TP/SL and trailing-stop manager.
+
+    Every price event (best bid/ask from OrderBookStream, or the polled price as a
+    fallback) is checked against the open positions in O(log n) per trigger or
+    trailing update, not O(n) per tick. A trigger sends a reduce-only market close
+    through `data_fetcher.close_position` on a worker thread, so the price feed is
+    never blocked on REST. A failed close is retried with exponential backoff (starting
+    at `retry_delay` seconds) until it succeeds or the position is reported gone.
+    Trailing stops that move by at least `amend_fraction` of the trail distance are also
+    pushed to the exchange as the position's stop loss, as a safety net.
+    """
+
+    def __init__(self, data_fetcher, amend_fraction=0.25, workers=4, retry_delay=1.0, max_retry_delay=60.0):
+        self.data_fetcher = data_fetcher
+        self.amend_fraction = amend_fraction
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.positions = {}  # position_id -> ManagedPosition
+        # Triggered positions whose close is in flight or not yet reflected by the exchange;
+        # kept until the position is reported gone so a sync cannot re-add and close it twice
+        self.closing = {}
+        self._books = {}  # (symbol, direction) -> _SideBook
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="position-manager")
+
+    def _book(self, symbol, direction):
+        return self._books.setdefault((symbol, direction), _SideBook())
+
+    def add_position(self, position_id, symbol, side, size, entry_price, stop_loss=None, take_profit=None,
+                     trail_distance=None):
+        position = ManagedPosition(position_id, symbol, side, size, entry_price, stop_loss, take_profit,
+                                   trail_distance)
+        with self._lock:
+            old = self.positions.pop(position_id, None)
+            if old:
+                self._book(old.symbol, old.direction).remove(old)
+            self.positions[position_id] = position
+            self._book(symbol, position.direction).push(position)
+        logging.info(f"Managing {side} {size} {symbol} @ {entry_price}: SL {position.stop_loss}, "
+                     f"TP {position.take_profit}, trail {trail_distance}")
+        return position
+
+    def remove_position(self, position_id):
+        with self._lock:
+            self.closing.pop(position_id, None)
+            position = self.positions.pop(position_id, None)
+            if position:
+                self._book(position.symbol, position.direction).remove(position)
+        return position
+
+    def managed_ids(self, symbol):
+        """
+        Ids of the symbol's positions the manager owns, including ones it is currently closing.
+        """
+        with self._lock:
+            return {pid for pid, position in itertools.chain(self.positions.items(), self.closing.items())
+                    if position.symbol == symbol}
+
+    def on_price(self, symbol, best_bid, best_ask):
+        """
+        Price event handler. Longs exit at the bid, shorts at the ask.
+        """
+        actions = []
+        with self._lock:
+            for direction, price in ((1, best_bid), (-1, best_ask)):
+                book = self._books.get((symbol, direction))
+                if book is None or price is None:
+                    continue
+                trailed, triggered = book.on_price(price * direction)
+                for position, reason in triggered:
+                    self.positions.pop(position.position_id, None)
+                    self.closing[position.position_id] = position
+                    actions.append((self._close, position, reason, price))
+                for position in trailed:
+                    if position.position_id in self.positions and self._needs_amend(position):
+                        position.exchange_stop = position.stop
+                        # Pass the level itself: the position may trail further before the worker runs
+                        actions.append((self._amend_stop, position, 'trailing_stop', position.stop_loss))
+
+        for action, position, reason, level in actions:
+            self._executor.submit(action, position, reason, level)
+
+    def _needs_amend(self, position):
+        if not self.amend_fraction:
+            return False
+        if position.exchange_stop is None:
+            return True
+        return position.stop - position.exchange_stop >= position.trail_distance * self.amend_fraction
+
+    def _close(self, position, reason, price):
+        with self._lock:
+            if self.closing.get(position.position_id) is not position:
+                return  # reported gone while the retry was waiting
+        logging.info(f"{reason} hit for {position.side} {position.symbol} at {price} "
+                     f"(SL {position.stop_loss}, TP {position.take_profit}). Closing position.")
+        size = position.size * position.direction
+        if self.data_fetcher.close_position(position.symbol, size):
+            return
+
+        # Keep it in `closing` rather than re-arming the triggers, which would resend the close on
+        # every tick; retry on a timer, backing off while the exchange keeps rejecting it
+        delay = min(self.retry_delay * 2 ** position.close_attempts, self.max_retry_delay)
+        position.close_attempts += 1
+        logging.warning(f"Closing {position.side} {position.symbol} failed. Retrying in {delay:.0f}s.")
+        timer = threading.Timer(delay, self._executor.submit, args=(self._close, position, reason, price))
+        timer.daemon = True
+        timer.start()
+
+    def _amend_stop(self, position, reason, stop_loss):
+        logging.info(f"Trailing stop for {position.side} {position.symbol} moved to {stop_loss}.")
+        self.data_fetcher.set_trading_stop(position.symbol, stop_loss=stop_loss)
@@ -0,0 +1,133 @@
+# profiler.py
+
+import collections
+import cProfile
+import logging
+import os
+import signal
+import sys
+import threading
+import time
+import tracemalloc
+
+
+class IterationProfiler:
+    """
+    On-demand CPU and allocation profiler for TradingBot.job.
+
+    A capture covers the next `iterations` calls and is started either at launch
+    (PROFILE_ITERATIONS=N) or at runtime by sending SIGUSR1 to the bot process.
+    When it finishes it writes to `output_dir`:
+      - <stamp>.prof: cProfile stats (pstats / snakeviz)
+      - <stamp>.folded: sampled stacks in collapsed format (flamegraph.pl, speedscope)
+      - <stamp>_memory.txt: per-iteration memory growth and top allocators by line
+    """
+
+    def __init__(self, iterations=None, output_dir=None, sample_interval=0.005):
+        self.iterations = iterations or int(os.getenv("PROFILE_ITERATIONS", 0) or 10)
+        self.output_dir = output_dir or os.getenv("PROFILE_DIR", "profiles")
+        self.sample_interval = sample_interval
+
+        self._requested = int(os.getenv("PROFILE_ITERATIONS", 0)) > 0
+        self._remaining = 0
+        self._profile = None
+        self._stacks = None
+        self._memory_rows = None
+        self._first_snapshot = None
+        self._baseline_memory = 0
+        self._owns_tracing = False
+
+    def install_signal_handler(self):
+        if hasattr(signal, "SIGUSR1"):
+            signal.signal(signal.SIGUSR1, lambda signum, frame: self.request())
+
+    def request(self):
+        """
+        Starts a capture at the next iteration. Safe to call from a signal handler.
+        """
+        self._requested = True
+
+    def run(self, func):
+        """
+        Calls `func`, profiling it if a capture is active.
+        """
+        if self._requested and not self._remaining:
+            self._start()
+        if not self._remaining:
+            return func()
+
+        thread_id = threading.get_ident()
+        stop_sampling = threading.Event()
+        sampler = threading.Thread(target=self._sample, args=(thread_id, stop_sampling), daemon=True)
+        sampler.start()
+
+        started = time.perf_counter()
+        self._profile.enable()
+        try:
+            return func()
+        finally:
+            self._profile.disable()
+            stop_sampling.set()
+            sampler.join()
+            self._record_memory(time.perf_counter() - started)
+            self._remaining -= 1
+            if not self._remaining:
+                self._finish()
+
+    def _start(self):
+        logging.info(f"Profiling the next {self.iterations} iterations...")
+        self._requested = False
+        self._remaining = self.iterations
+        self._profile = cProfile.Profile()
+        self._stacks = collections.Counter()
+        self._memory_rows = []
+        # Leave tracing that another tool started running when the capture ends
+        self._owns_tracing = not tracemalloc.is_tracing()
+        if self._owns_tracing:
+            tracemalloc.start(25)
+        self._first_snapshot = tracemalloc.take_snapshot()
+        self._baseline_memory = tracemalloc.get_traced_memory()[0]
+
+    def _sample(self, thread_id, stop_sampling):
+        while not stop_sampling.wait(self.sample_interval):
+            frame = sys._current_frames().get(thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                frame = frame.f_back
+            if stack:
+                self._stacks[";".join(reversed(stack))] += 1
+
+    def _record_memory(self, duration):
+        current, peak = tracemalloc.get_traced_memory()
+        previous = self._memory_rows[-1][2] if self._memory_rows else self._baseline_memory
+        self._memory_rows.append((len(self._memory_rows) + 1, duration, current, peak, current - previous))
+        tracemalloc.reset_peak()
+
+    def _finish(self):
+        os.makedirs(self.output_dir, exist_ok=True)
+        base = os.path.join(self.output_dir, time.strftime("%Y%m%d_%H%M%S"))
+
+        self._profile.dump_stats(f"{base}.prof")
+
+        with open(f"{base}.folded", "w", encoding="utf-8") as f:
+            for stack, count in self._stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+        top_growth = tracemalloc.take_snapshot().compare_to(self._first_snapshot, "lineno")[:25]
+        with open(f"{base}_memory.txt", "w", encoding="utf-8") as f:
+            f.write(f"{'iter':>4} {'seconds':>9} {'current_kb':>11} {'peak_kb':>9} {'growth_kb':>10}\n")
+            for iteration, duration, current, peak, growth in self._memory_rows:
+                f.write(f"{iteration:>4} {duration:>9.3f} {current / 1024:>11.1f} "
+                        f"{peak / 1024:>9.1f} {growth / 1024:>10.1f}\n")
+            f.write("\nTop allocation growth since capture start:\n")
+            for stat in top_growth:
+                f.write(f"{stat}\n")
+
+        if self._owns_tracing:
+            # Stop tracing so the bot runs at full speed between captures
+            tracemalloc.stop()
+        self._profile = None
+        self._stacks = None
+        logging.info(f"Profiling finished. Results written to {base}.prof, {base}.folded and {base}_memory.txt")
@@ -0,0 +1,72 @@
+# resilience.py
+
+import collections
+import threading
+import time
+
+
+class DeadlineExceeded(Exception):
+    """Raised when the current iteration's time budget is used up before a request is sent."""
+
+
+class CircuitOpenError(Exception):
+    """Raised when an endpoint's circuit breaker is open and the request is refused locally."""
+
+
+class CircuitBreaker:
+    """
+    Per-endpoint circuit breaker. After `failure_threshold` consecutive failures the
+    circuit opens and requests fail fast for `reset_timeout` seconds; then a single
+    trial request is let through (half-open) and its outcome closes or re-opens it.
+    """
+
+    def __init__(self, name, failure_threshold=5, reset_timeout=30):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def before_request(self):
+        with self._lock:
+            if self.opened_at is None:
+                return
+            if time.monotonic() - self.opened_at < self.reset_timeout or self._trial_in_flight:
+                raise CircuitOpenError(f"Circuit open for {self.name}")
+            self._trial_in_flight = True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_in_flight = False
+            if self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+
+class LatencyTracker:
+    """
+    Rolling window of request latencies, used to decide when to hedge a slow request.
+    """
+
+    def __init__(self, window=200):
+        self.samples = collections.deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds):
+        with self._lock:
+            self.samples.append(seconds)
+
+    def percentile(self, pct, default):
+        with self._lock:
+            if len(self.samples) < 20:
+                return default
+            ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
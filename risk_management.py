@@ -1,6 +1,5 @@
 # risk_management.py
 
-import pandas as pd
 import os
 from helpers import Helpers  # Ensure this import is present
 from indicators import Indicators
@@ -14,6 +13,8 @@ class RiskManagement:
         self.indicators = Indicators()
 
     def calculate_atr(self, df):
+        import pandas as pd
+
         high = df['high'].astype(float)
         low = df['low'].astype(float)
         close = df['close'].astype(float)
@@ -28,15 +29,21 @@ class RiskManagement:
 
     def calculate_risk_management(self, df, trend):
         atr = self.calculate_atr(df)
-        stop_loss_distance = self.stop_loss_percentage / 100 * df['close'].iloc[-1]
+        return self.calculate_exit_levels(df['close'].iloc[-1], atr, trend)
+
+    def calculate_exit_levels(self, price, atr, trend):
+        """
+        Stop loss at `stop_loss_percentage` and take profit at `atr * atr_multiplier` from `price`.
+        """
+        stop_loss_distance = self.stop_loss_percentage / 100 * price
         take_profit_distance = atr * self.atr_multiplier
 
         if trend == 'long':
-            stop_loss = df['close'].iloc[-1] - stop_loss_distance
-            take_profit = df['close'].iloc[-1] + take_profit_distance
+            stop_loss = price - stop_loss_distance
+            take_profit = price + take_profit_distance
         elif trend == 'short':
-            stop_loss = df['close'].iloc[-1] + stop_loss_distance
-            take_profit = df['close'].iloc[-1] - take_profit_distance
+            stop_loss = price + stop_loss_distance
+            take_profit = price - take_profit_distance
         else:
             raise ValueError("Trend must be either 'long' or 'short'")
 
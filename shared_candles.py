@@ -0,0 +1,235 @@
+# shared_candles.py
+
+import os
+import time
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+# Header slots (int64). GENERATION identifies one feeder's segment; HEARTBEAT is the
+# time (ms) of the feeder's last successful update.
+SEQ, HEAD, COUNT, CAPACITY, GENERATION, HEARTBEAT = range(6)
+HEADER_SLOTS = 6
+HEADER_SIZE = HEADER_SLOTS * 8
+# Row layout, same column order as Bybit kline rows
+COLUMNS = ["timestamp", "open", "high", "low", "close", "volume", "turnover"]
+
+
+def segment_name(symbol, interval, prefix=None):
+    prefix = prefix or os.getenv("SHARED_CANDLES_PREFIX", "cbbot")
+    return f"{prefix}_{symbol}_{interval}"
+
+
+def _attach(name):
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python < 3.13 has no `track`; unregister so this process exiting doesn't unlink the feeder's segment
+        shm = shared_memory.SharedMemory(name=name)
+        resource_tracker.unregister(shm._name, "shared_memory")
+        return shm
+
+
+def _arrays(buf, capacity):
+    header = np.ndarray((HEADER_SLOTS,), dtype=np.int64, buffer=buf)
+    # Mirrored ring: every row is written at i and i + capacity, so the latest
+    # `count` rows are always one contiguous slice and readers never need to copy.
+    data = np.ndarray((2 * capacity, len(COLUMNS)), dtype=np.float64, buffer=buf, offset=HEADER_SIZE)
+    return header, data
+
+
+class SharedCandleBuffer:
+    """
+    Feeder side: owns a named shared-memory ring buffer of OHLCV candles for one
+    symbol/interval. There must be exactly one writer per segment.
+    Writes are guarded by a seqlock: the sequence number is odd while a write is in progress.
+    """
+
+    def __init__(self, symbol, interval, capacity=1000, prefix=None):
+        self.name = segment_name(symbol, interval, prefix)
+        self.capacity = capacity
+        size = HEADER_SIZE + 2 * capacity * len(COLUMNS) * 8
+        try:
+            self.shm = shared_memory.SharedMemory(name=self.name, create=True, size=size)
+        except FileExistsError:
+            # Left behind by a feeder that crashed; take it over
+            stale = shared_memory.SharedMemory(name=self.name)
+            stale.close()
+            stale.unlink()
+            self.shm = shared_memory.SharedMemory(name=self.name, create=True, size=size)
+        self.header, self.data = _arrays(self.shm.buf, capacity)
+        self.header[:] = [0, -1, 0, capacity, time.time_ns(), 0]
+
+    def update(self, candles):
+        """
+        Writes Bybit kline rows (any order) into the ring. A row with the same start time
+        as the newest one replaces it (the still-forming candle); older rows are ignored.
+        """
+        rows = sorted(candles, key=lambda c: int(c[0]))
+        header, data, capacity = self.header, self.data, self.capacity
+
+        header[SEQ] += 1  # odd: write in progress
+        try:
+            for candle in rows:
+                row = np.array(candle[:len(COLUMNS)], dtype=np.float64)
+                head, count = header[HEAD], header[COUNT]
+                if count and row[0] < data[head, 0]:
+                    continue
+                if not count or row[0] > data[head, 0]:
+                    head = (head + 1) % capacity
+                    header[HEAD] = head
+                    header[COUNT] = min(count + 1, capacity)
+                data[head] = row
+                data[head + capacity] = row
+            header[HEARTBEAT] = int(time.time() * 1000)
+        finally:
+            header[SEQ] += 1  # even: consistent again
+
+    def close(self):
+        self.shm.close()
+        self.shm.unlink()
+
+
+class SharedCandleReader:
+    """
+    Worker side: attaches to a feeder's segment and reads consistent, zero-copy NumPy views.
+    If the feeder stops updating for `max_age` seconds the reader tries to reattach (a
+    restarted feeder creates a new segment under the same name); while the data stays
+    stale, to_kline_list() returns None so the bot never trades on frozen candles.
+    """
+
+    def __init__(self, symbol, interval, prefix=None, max_age=None, read_timeout=1.0):
+        self.name = segment_name(symbol, interval, prefix)
+        self.max_age = max_age or float(os.getenv("SHARED_CANDLES_MAX_AGE", 30))
+        self.read_timeout = read_timeout  # longest read() waits for a consistent snapshot
+        self.shm = None
+        self._attach()
+
+    def _attach(self):
+        shm = _attach(self.name)
+        if self.shm is not None:
+            # Release our views of the old mapping before closing it
+            del self.header, self.data
+            self.shm.close()
+        self.shm = shm
+        capacity = int(np.ndarray((HEADER_SLOTS,), dtype=np.int64, buffer=shm.buf)[CAPACITY])
+        self.header, self.data = _arrays(shm.buf, capacity)
+        self.capacity = capacity
+
+    def age(self):
+        """
+        Seconds since the feeder last updated this segment.
+        """
+        return time.time() - self.header[HEARTBEAT] / 1000
+
+    def _replaced(self):
+        """
+        True if a restarted feeder has created a new segment under our name.
+        """
+        try:
+            current = _attach(self.name)
+        except FileNotFoundError:
+            return False
+        replaced = np.ndarray((HEADER_SLOTS,), dtype=np.int64, buffer=current.buf)[GENERATION] != \
+            self.header[GENERATION]
+        current.close()
+        return replaced
+
+    def is_fresh(self):
+        """
+        True if the feeder updated the segment within `max_age` seconds, reattaching once if a
+        newer segment has replaced the one we are mapped to.
+        """
+        if self.age() < self.max_age:
+            return True
+        if self._replaced():
+            self._attach()
+        return self.age() < self.max_age
+
+    def read(self, func, limit=None):
+        """
+        Calls `func(view)` with a chronological (oldest first) zero-copy view of the latest
+        `limit` candles, columns as in COLUMNS, and returns its result.
+        If the feeder wrote during the call, `func` is re-run on the new data, so it must not
+        keep references to the view or have side effects.
+        Returns None if no consistent snapshot could be read within `read_timeout` seconds,
+        e.g. because the feeder died in the middle of a write.
+        """
+        deadline = time.monotonic() + self.read_timeout
+        reattached = False
+        while True:
+            header, data, capacity = self.header, self.data, self.capacity
+            seq = header[SEQ]
+            if not seq % 2:
+                head, count = header[HEAD], header[COUNT]
+                if limit is not None:
+                    count = min(count, limit)
+                view = data[head + capacity + 1 - count:head + capacity + 1]
+                result = func(view)
+                if header[SEQ] == seq:
+                    return result
+            # A write left open past the heartbeat age will never finish (the feeder died mid-write)
+            stuck = seq % 2 and self.age() >= self.max_age
+            if not stuck and time.monotonic() < deadline:
+                time.sleep(0)
+                continue
+            # Only a restarted feeder's new segment can still give us data
+            if reattached or not self._replaced():
+                return None
+            header = data = view = None  # release the old mapping's views so it can be closed
+            self._attach()
+            reattached = True
+            deadline = time.monotonic() + self.read_timeout
+
+    def version(self):
+        """
+        Sequence number of the last completed write; changes whenever new data arrives.
+        """
+        return int(self.header[SEQ]) & ~1
+
+    def to_kline_list(self, limit=None):
+        """
+        Returns the candles as Bybit kline rows (newest first), for Strategies.prepare_dataframe,
+        or None if the feeder has stopped updating them.
+        """
+        if not self.is_fresh():
+            return None
+        rows = self.read(lambda view: view[::-1].tolist(), limit)
+        if rows is None:
+            return None
+        return [[str(int(row[0]))] + [repr(value) for value in row[1:]] for row in rows]
+
+    def close(self):
+        self.shm.close()
+
+
+if __name__ == "__main__":
+    # Feeder process: fetches candles once and publishes them to shared memory for all bot workers
+    import logging
+    from dotenv import load_dotenv
+    from bybit_demo_session import BybitDemoSession
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    load_dotenv()
+    session = BybitDemoSession(os.getenv("BYBIT_API_KEY"), os.getenv("BYBIT_API_SECRET"))
+    symbols = os.getenv("TRADING_SYMBOLS", os.getenv("TRADING_SYMBOL", 'BTCUSDT')).split(",")
+    interval = os.getenv("TRADING_INTERVAL", '15')
+    capacity = int(os.getenv("SHARED_CANDLES_CAPACITY", 1000))
+
+    buffers = {symbol: SharedCandleBuffer(symbol, interval, capacity) for symbol in symbols}
+    backfilled = set()
+    try:
+        while True:
+            for symbol, buffer in buffers.items():
+                # Backfill the whole ring once, then only the latest candles
+                limit = 3 if symbol in backfilled else min(capacity, 1000)
+                candles = session.get_historical_data(symbol, interval, limit)
+                if candles:
+                    buffer.update(candles)
+                    backfilled.add(symbol)
+                else:
+                    logging.warning(f"Failed to fetch candles for {symbol}.")
+            time.sleep(int(os.getenv("SHARED_CANDLES_POLL_INTERVAL", 10)))
+    finally:
+        for buffer in buffers.values():
+            buffer.close()
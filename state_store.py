@@ -0,0 +1,74 @@
+# state_store.py
+
+import json
+import os
+import time
+
+
+class StateStore:
+    """
+    Persists per-symbol bot state (candle buffers and cooldown timestamps) to a
+    local JSON file so a restarted bot can resume without refetching everything.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or os.getenv("STATE_FILE", "bot_state.json")
+        self.state = {"saved_at": 0, "symbols": {}}
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return False
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+            if not isinstance(state.get("symbols"), dict):
+                raise ValueError("Malformed state file")
+            self.state = state
+            return True
+        except Exception as e:
+            print(f"Error loading state snapshot: {e}")
+            return False
+
+    def save(self):
+        try:
+            self.state["saved_at"] = time.time()
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self.state, f)
+            # Atomic swap so a crash mid-write never leaves a truncated snapshot
+            os.replace(tmp_path, self.path)
+            return True
+        except Exception as e:
+            print(f"Error saving state snapshot: {e}")
+            return False
+
+    def symbol_state(self, symbol):
+        return self.state["symbols"].setdefault(symbol, {
+            "candles": {},
+            "last_closed_position_time": 0,
+        })
+
+    def get_candles(self, symbol, interval):
+        """
+        Returns the cached candles for symbol/interval in Bybit order (newest first).
+        """
+        return self.symbol_state(symbol)["candles"].get(str(interval), [])
+
+    def merge_candles(self, symbol, interval, new_candles, limit):
+        """
+        Merges freshly fetched candles into the cached buffer, keyed by start time.
+        Newer data for the same start time (the still-forming candle) replaces the old row.
+        Returns the merged buffer, newest first and capped at `limit` rows.
+        """
+        by_start = {candle[0]: candle for candle in self.get_candles(symbol, interval)}
+        for candle in new_candles:
+            by_start[candle[0]] = candle
+        merged = sorted(by_start.values(), key=lambda c: int(c[0]), reverse=True)[:limit]
+        self.symbol_state(symbol)["candles"][str(interval)] = merged
+        return merged
+
+    def get_last_closed_position_time(self, symbol):
+        return self.symbol_state(symbol).get("last_closed_position_time", 0)
+
+    def set_last_closed_position_time(self, symbol, timestamp):
+        self.symbol_state(symbol)["last_closed_position_time"] = timestamp
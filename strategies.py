@@ -1,4 +1,3 @@
-import pandas as pd
 from indicators import Indicators
 import logging
 
@@ -11,6 +10,8 @@ class Strategies:
         """
         Prepares the DataFrame from historical data, sorting and formatting it correctly.
         """
+        import pandas as pd  # Deferred: TradingBot preloads it in the background at startup
+
         df = pd.DataFrame(historical_data)
         df.columns = ["timestamp", "open", "high", "low", "close", "volume", "turnover"]
         df['close'] = df['close'].astype(float)
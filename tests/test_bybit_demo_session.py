@@ -0,0 +1,99 @@
+import time
+
+import pytest
+
+from bybit_demo_session import BybitDemoSession
+from order_book import OrderBookStream
+from resilience import CircuitBreaker, DeadlineExceeded
+from trade_journal import TradeJournal
+
+
+class FakeResponse:
+    def __init__(self, data):
+        self.data = data
+
+    def json(self):
+        return self.data
+
+
+class FakeHTTP:
+    def __init__(self):
+        self.posts = []
+
+    def post(self, url, json, timeout):
+        self.posts.append((url, json))
+        if url.endswith("/v5/order/create"):
+            return FakeResponse({"retCode": 0, "retMsg": "OK", "result": {
+                "orderId": "order-1", "orderLinkId": json["orderLinkId"], "symbol": json["symbol"], "side": json["side"],
+            }})
+        return FakeResponse({"retCode": 0, "retMsg": "OK", "result": {}})
+
+
+def test_place_order_with_journal_records_request_and_response(tmp_path):
+    journal = TradeJournal(str(tmp_path / "journal.sqlite3"))
+    session = BybitDemoSession("key", "secret", journal=journal)
+    session.http = FakeHTTP()
+
+    result = session.place_order("BTCUSDT", "Sell", 0.01, 60000.0, 10, stop_loss=63000.0, take_profit=58000.0)
+    journal.flush()
+    records = journal.query(symbol="BTCUSDT")
+    journal.close()
+
+    assert result["orderId"] == "order-1"
+    assert [(r["kind"], r["side"]) for r in records] == [("order_request", "sell"), ("order_response", "sell")]
+    request, response = records
+    assert request["params"]["orderLinkId"] == result["orderLinkId"]
+    assert request["params"]["stopLoss"] == "63000.0"
+    assert response["orderLinkId"] == result["orderLinkId"]
+    assert response["result"]["orderId"] == "order-1"
+
+
+def test_expired_deadline_does_not_leak_half_open_trial():
+    session = BybitDemoSession("key", "secret")
+    session.http = FakeHTTP()
+    breaker = session.circuit_breakers.setdefault("/v5/position/set-leverage", CircuitBreaker("set-leverage"))
+    breaker.failures = breaker.failure_threshold
+    breaker.opened_at = time.monotonic() - breaker.reset_timeout - 1  # half-open
+
+    with session.iteration_deadline(0):
+        with pytest.raises(DeadlineExceeded):
+            session.send_request("POST", "/v5/position/set-leverage", {})
+
+    # The trial slot is still available once the deadline no longer applies
+    response = session.send_request("POST", "/v5/position/set-leverage", {})
+    assert response["retCode"] == 0
+    assert breaker.opened_at is None
+
+
+def test_open_entry_breaker_does_not_block_reduce_only_close():
+    session = BybitDemoSession("key", "secret")
+    session.http = FakeHTTP()
+    breaker = session.circuit_breakers.setdefault("/v5/order/create", CircuitBreaker("order-create"))
+    breaker.failures = breaker.failure_threshold
+    breaker.opened_at = time.monotonic()  # open after failed entry orders
+
+    assert session.place_order("BTCUSDT", "Buy", 0.01, 60000.0, 10) is None
+    assert session.close_position("BTCUSDT", 0.01)["retCode"] == 0
+    assert session.http.posts[-1][1]["reduceOnly"] is True
+
+
+def test_close_of_an_already_closed_position_counts_as_closed():
+    session = BybitDemoSession("key", "secret")
+    session.http = FakeHTTP()
+    session.http.post = lambda url, json, timeout: FakeResponse(
+        {"retCode": 110017, "retMsg": "current position is zero, cannot fix reduce-only order qty", "result": {}})
+
+    assert session.close_position("BTCUSDT", 0.01)
+
+
+def test_place_order_with_fresh_book_joins_the_touch_post_only():
+    stream = OrderBookStream(["BTCUSDT"])
+    stream.books["BTCUSDT"].apply_snapshot({"u": 1, "b": [["60000.0", "1"]], "a": [["60000.5", "1"]]})
+    session = BybitDemoSession("key", "secret", order_book_stream=stream)
+    session.http = FakeHTTP()
+
+    assert session.place_order("BTCUSDT", "Buy", 0.01, 60010.0, 10)["orderId"] == "order-1"
+    order = next(params for url, params in session.http.posts if url.endswith("/v5/order/create"))
+    assert order["orderType"] == "Limit"
+    assert order["timeInForce"] == "PostOnly"
+    assert order["price"] == "60000.0"
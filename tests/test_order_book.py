@@ -0,0 +1,65 @@
+from order_book import OrderBook
+
+
+def snapshot(book, u=10):
+    book.apply_snapshot({"s": "BTCUSDT", "u": u,
+                         "b": [["100.0", "1"], ["99.5", "2"], ["99.0", "3"]],
+                         "a": [["100.5", "1"], ["101.0", "2"], ["101.5", "3"]]})
+
+
+def test_snapshot_then_delta_updates_levels_and_touch():
+    book = OrderBook("BTCUSDT")
+    snapshot(book)
+    book.apply_delta({"u": 11, "b": [["100.2", "4"], ["99.5", "5"]], "a": [["100.4", "1"]]})
+
+    assert book.best_bid() == 100.2
+    assert book.best_ask() == 100.4
+    assert book.bids[99.5] == 5
+    assert book.mid_price() == (100.2 + 100.4) / 2
+    assert book.is_fresh()
+
+
+def test_zero_size_deletes_level():
+    book = OrderBook("BTCUSDT")
+    snapshot(book)
+    book.apply_delta({"u": 11, "b": [["100.0", "0"], ["42.0", "0"]], "a": [["100.5", "0"]]})
+
+    assert 100.0 not in book.bids
+    assert book.best_bid() == 99.5
+    assert book.best_ask() == 101.0
+    assert book._bid_prices == [99.0, 99.5]
+
+
+def test_stale_update_id_is_ignored():
+    book = OrderBook("BTCUSDT")
+    snapshot(book)
+    book.apply_delta({"u": 12, "b": [["100.1", "1"]]})
+    book.apply_delta({"u": 11, "b": [["100.3", "1"]]})
+    book.apply_delta({"u": 12, "a": [["100.5", "0"]]})
+
+    assert book.best_bid() == 100.1
+    assert book.best_ask() == 100.5
+    assert book.update_id == 12
+
+
+def test_update_id_one_resets_the_book():
+    book = OrderBook("BTCUSDT")
+    snapshot(book, u=500)
+    book.apply_delta({"u": 1, "b": [["90.0", "1"]], "a": [["91.0", "1"]]})
+
+    assert book.bids == {90.0: 1.0}
+    assert book.asks == {91.0: 1.0}
+    assert book.update_id == 1
+    book.apply_delta({"u": 2, "b": [["90.5", "1"]]})
+    assert book.best_bid() == 90.5
+
+
+def test_expected_fill_price_walks_depth_and_gives_up_when_it_runs_out():
+    book = OrderBook("BTCUSDT")
+    snapshot(book)
+
+    assert book.expected_fill_price("Buy", 1) == 100.5
+    assert book.expected_fill_price("Buy", 2) == (100.5 + 101.0) / 2
+    assert book.expected_fill_price("Sell", 3) == (100.0 + 2 * 99.5) / 3
+    assert book.expected_fill_price("Buy", 7) is None
+    assert book.expected_slippage("Sell", 7) is None
@@ -0,0 +1,72 @@
+import time
+
+from position_manager import PositionManager
+
+
+class FakeFetcher:
+    def __init__(self):
+        self.closed = []
+        self.stops = []
+
+    def close_position(self, symbol, size):
+        self.closed.append((symbol, size))
+        return {"retCode": 0}
+
+    def set_trading_stop(self, symbol, stop_loss=None, take_profit=None):
+        self.stops.append(stop_loss)
+
+
+def test_trailing_updates_do_not_grow_heaps_without_bound():
+    manager = PositionManager(FakeFetcher(), amend_fraction=0)
+    manager.add_position("BTCUSDT:0", "BTCUSDT", "Buy", 1, 100.0, stop_loss=95.0, take_profit=1e9, trail_distance=5.0)
+
+    for tick in range(10000):
+        price = 100.0 + tick * 0.01
+        manager.on_price("BTCUSDT", price, price)
+
+    book = manager._books[("BTCUSDT", 1)]
+    assert all(len(heap) <= 64 for heap in (book.stops, book.targets, book.peaks))
+    assert manager.positions["BTCUSDT:0"].stop_loss == (100.0 + 9999 * 0.01) - 5.0
+
+
+def test_triggered_position_stays_managed_until_reported_gone():
+    fetcher = FakeFetcher()
+    manager = PositionManager(fetcher, amend_fraction=0)
+    manager.add_position("BTCUSDT:0", "BTCUSDT", "Sell", 2, 100.0, stop_loss=105.0, take_profit=90.0)
+
+    manager.on_price("BTCUSDT", 105.0, 105.5)
+    manager.on_price("BTCUSDT", 106.0, 106.5)
+    manager._executor.shutdown(wait=True)
+
+    assert fetcher.closed == [("BTCUSDT", -2)]
+    # The exchange may still report the position; the sync must not hand it back as new
+    assert manager.managed_ids("BTCUSDT") == {"BTCUSDT:0"}
+
+    manager.remove_position("BTCUSDT:0")
+    assert manager.managed_ids("BTCUSDT") == set()
+
+
+class RejectingFetcher(FakeFetcher):
+    def close_position(self, symbol, size):
+        self.closed.append((symbol, size))
+        return None
+
+
+def test_failed_close_is_retried_with_backoff_not_on_every_tick():
+    fetcher = RejectingFetcher()
+    manager = PositionManager(fetcher, amend_fraction=0, retry_delay=0.2)
+    manager.add_position("BTCUSDT:0", "BTCUSDT", "Buy", 1, 100.0, stop_loss=95.0, take_profit=110.0)
+
+    started = time.monotonic()
+    while time.monotonic() - started < 0.5:
+        manager.on_price("BTCUSDT", 94.0, 94.5)
+        time.sleep(0.01)
+
+    # First attempt, then retries after 0.2s and 0.4s more: the second retry is still pending
+    assert len(fetcher.closed) == 2
+    assert manager.managed_ids("BTCUSDT") == {"BTCUSDT:0"}
+
+    # Reported gone: the pending retry is dropped
+    manager.remove_position("BTCUSDT:0")
+    time.sleep(0.3)
+    assert len(fetcher.closed) == 2
@@ -0,0 +1,40 @@
+import time
+
+from shared_candles import SEQ, SharedCandleBuffer, SharedCandleReader
+
+
+def candles(start, n):
+    return [[str((start + i) * 900000), "1", "2", "0.5", "1.5", "10", "15"] for i in range(n)]
+
+
+def test_read_gives_up_when_the_feeder_dies_mid_write():
+    buffer = SharedCandleBuffer("TESTUSDT", "15", capacity=16, prefix="cbbottest")
+    try:
+        buffer.update(candles(0, 5))
+        reader = SharedCandleReader("TESTUSDT", "15", prefix="cbbottest", read_timeout=0.2)
+        assert len(reader.to_kline_list()) == 5
+
+        buffer.header[SEQ] += 1  # a write that never completes
+        started = time.monotonic()
+        assert reader.to_kline_list() is None
+        assert time.monotonic() - started < 1
+        reader.close()
+    finally:
+        buffer.close()
+
+
+def test_read_switches_to_a_restarted_feeders_segment():
+    buffer = SharedCandleBuffer("TESTUSDT", "15", capacity=16, prefix="cbbottest")
+    buffer.update(candles(0, 5))
+    reader = SharedCandleReader("TESTUSDT", "15", prefix="cbbottest", read_timeout=0.2)
+    buffer.header[SEQ] += 1
+    buffer.shm.close()  # killed mid-write, segment left behind
+
+    restarted = SharedCandleBuffer("TESTUSDT", "15", capacity=16, prefix="cbbottest")
+    try:
+        restarted.update(candles(10, 3))
+        rows = reader.to_kline_list()
+        assert [int(row[0]) for row in rows] == [12 * 900000, 11 * 900000, 10 * 900000]
+        reader.close()
+    finally:
+        restarted.close()
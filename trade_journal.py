@@ -0,0 +1,132 @@
+# trade_journal.py
+
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+
+class TradeJournal:
+    """
+    Append-only journal of bot evaluations and order requests/responses, stored in SQLite
+    and indexed by symbol and time.
+
+    `record()` only enqueues; a background thread writes queued records in one transaction
+    per batch, so the trading loop never waits on disk and fsyncs are amortised over the batch.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS journal (
+            id INTEGER PRIMARY KEY,
+            ts REAL NOT NULL,
+            symbol TEXT NOT NULL,
+            kind TEXT NOT NULL,
+            side TEXT,
+            payload TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_journal_symbol_ts ON journal (symbol, ts);
+        CREATE INDEX IF NOT EXISTS idx_journal_symbol_kind_side_ts ON journal (symbol, kind, side, ts);
+    """
+
+    def __init__(self, path=None, flush_interval=1.0, batch_size=500):
+        self.path = path or os.getenv("JOURNAL_FILE", "trade_journal.sqlite3")
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self._queue = queue.Queue()
+        self._read_lock = threading.Lock()
+
+        conn = self._connect()
+        conn.executescript(self.SCHEMA)
+        conn.close()
+        self._read_conn = self._connect()
+
+        self._writer = threading.Thread(target=self._write_loop, name="trade-journal", daemon=True)
+        self._writer.start()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        # WAL lets queries run while the writer appends; FULL fsyncs every commit, i.e. once per batch
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=FULL")
+        return conn
+
+    def record(self, symbol, kind, side=None, **payload):
+        """
+        Queues one record. `kind` is e.g. 'evaluation', 'order_request' or 'order_response'.
+        """
+        self._queue.put((time.time(), symbol, kind, side, json.dumps(payload, default=str)))
+
+    def _write_loop(self):
+        conn = self._connect()
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            stop = None in batch
+            records = [record for record in batch if record is not None]
+            try:
+                with conn:
+                    conn.executemany(
+                        "INSERT INTO journal (ts, symbol, kind, side, payload) VALUES (?, ?, ?, ?, ?)", records)
+            except Exception as e:
+                logging.error(f"Failed to write {len(records)} journal records: {e}")
+            for _ in batch:
+                self._queue.task_done()
+            if stop:
+                conn.close()
+                return
+
+    def flush(self):
+        """
+        Blocks until every queued record has been written.
+        """
+        self._queue.join()
+
+    def close(self):
+        self._queue.put(None)
+        self._writer.join()
+        self._read_conn.close()
+
+    def query(self, symbol=None, kind=None, side=None, since=None, until=None, limit=None):
+        """
+        Returns matching records, oldest first, as dicts with the payload decoded.
+        Example: all sell signals on BTCUSDT in the last week:
+            journal.query(symbol='BTCUSDT', kind='evaluation', side='sell', since=time.time() - 7 * 86400)
+        """
+        clauses, params = [], []
+        for column, value in (("symbol", symbol), ("kind", kind), ("side", side)):
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        if since is not None:
+            clauses.append("ts >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("ts < ?")
+            params.append(until)
+
+        sql = "SELECT ts, symbol, kind, side, payload FROM journal"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY ts"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+
+        with self._read_lock:
+            rows = self._read_conn.execute(sql, params).fetchall()
+        return [
+            {"ts": ts, "symbol": row_symbol, "kind": row_kind, "side": row_side, **json.loads(payload)}
+            for ts, row_symbol, row_kind, row_side, payload in rows
+        ]
@@ -1,15 +1,21 @@
 import schedule
 import time
 import logging
-from data_fetcher import DataFetcher
+import importlib
+import threading
 from indicators import Indicators
 from strategies import Strategies
 from risk_management import RiskManagement
 from dotenv import load_dotenv
 import os
-import pandas as pd
 from bybit_demo_session import BybitDemoSession
+from bybit_private_stream import BybitPrivateStream
+from order_book import OrderBookStream
 from helpers import Helpers
+from profiler import IterationProfiler
+from state_store import StateStore
+from trade_journal import TradeJournal
+from position_manager import PositionManager
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
@@ -20,25 +26,152 @@ class TradingBot:
         self.api_secret = os.getenv("BYBIT_API_SECRET") 
         if not self.api_key or not self.api_secret:
             raise ValueError("API keys not found. Please set BYBIT_API_KEY and BYBIT_API_SECRET in your .env file.")
+
+        # Import pandas (~0.25s) in the background, overlapping the stream connects and the first
+        # candle fetch instead of blocking the first prepare_dataframe() call
+        threading.Thread(target=importlib.import_module, args=("pandas",), name="preload-pandas", daemon=True).start()
         
-        self.data_fetcher = BybitDemoSession(self.api_key, self.api_secret)
+        self.private_stream = None
+        if os.getenv("ENABLE_PRIVATE_STREAM", "true").lower() == "true":
+            self.private_stream = BybitPrivateStream(self.api_key, self.api_secret)
+            self.private_stream.start()
+
+        self.symbol = os.getenv("TRADING_SYMBOL", 'BTCUSDT')
+
+        self.order_book_stream = None
+        if os.getenv("ENABLE_ORDER_BOOK", "true").lower() == "true":
+            self.order_book_stream = OrderBookStream([self.symbol], depth=int(os.getenv("ORDER_BOOK_DEPTH", 50)))
+            self.order_book_stream.start()
+
+        self.journal = None
+        if os.getenv("ENABLE_JOURNAL", "true").lower() == "true":
+            self.journal = TradeJournal()
+
+        self.data_fetcher = BybitDemoSession(self.api_key, self.api_secret, private_stream=self.private_stream,
+                                             order_book_stream=self.order_book_stream, journal=self.journal)
         self.strategy = Strategies(self.data_fetcher)
         self.indicators = Indicators()
         self.risk_management = RiskManagement()
-        self.symbol = os.getenv("TRADING_SYMBOL", 'BTCUSDT')
+
+        # Local TP/SL/trailing exits, driven by every order book update when the stream is enabled
+        self.position_manager = PositionManager(self.data_fetcher)
+        self.trailing_atr_multiplier = float(os.getenv("TRAILING_ATR_MULTIPLIER", 1.0))
+        self.pending_exits = {}  # symbol -> (stop_loss, take_profit) of the last order, applied once it fills
+        if self.order_book_stream:
+            self.order_book_stream.add_listener(self.position_manager.on_price)
+        if self.private_stream:
+            # Stop managing a position as soon as the exchange reports it closed, not at the next sync
+            self.private_stream.add_position_listener(self.on_position_update)
         self.quantity = float(os.getenv("TRADE_QUANTITY", 0.03))
-        self.last_closed_position_time = 0
+        self.candle_limit = 400
+        self.snapshot_interval = int(os.getenv("STATE_SNAPSHOT_INTERVAL", 60))
+        # Time budget for all non-order requests in one iteration; keeps a degraded exchange from stalling the loop
+        self.iteration_deadline = float(os.getenv("ITERATION_DEADLINE", 8))
+
+        self.profiler = IterationProfiler()
+
+        self.shared_candles = None
+        if os.getenv("CANDLE_SOURCE", "rest").lower() == "shared":
+            # Read candles published by a `python shared_candles.py` feeder instead of fetching them here
+            from shared_candles import SharedCandleReader
+            self.shared_candles = SharedCandleReader(self.symbol, '15')
+
+        # Warm start: restore candle buffers and cooldown state from the last snapshot
+        self.state_store = StateStore()
+        if self.state_store.load():
+            logging.info(f"Restored state snapshot from {self.state_store.path}: "
+                         f"{len(self.state_store.get_candles(self.symbol, '15'))} M15 candles")
+        self.last_closed_position_time = self.state_store.get_last_closed_position_time(self.symbol)
+
+    def fetch_candles(self, interval, limit):
+        """
+        Returns `limit` candles for the trading symbol, newest first.
+        Only the candles missing since the last cached one are requested from the exchange;
+        a full fetch is done when the cache is empty or too short.
+        With CANDLE_SOURCE=shared the candles come from the shared-memory feeder instead.
+        """
+        if self.shared_candles:
+            candles = self.shared_candles.to_kline_list(limit)
+            return candles or None
+
+        cached = self.state_store.get_candles(self.symbol, interval)
+        fetch_limit = limit
+        if len(cached) >= limit:
+            interval_ms = int(interval) * 60 * 1000
+            elapsed_ms = int(time.time() * 1000) - int(cached[0][0])
+            # +2 re-fetches the still-forming candle and the one before it in case it was closed late
+            fetch_limit = min(limit, max(elapsed_ms // interval_ms, 0) + 2)
+
+        new_candles = self.data_fetcher.get_historical_data(self.symbol, interval, fetch_limit)
+        if not new_candles:
+            return None
+        return self.state_store.merge_candles(self.symbol, interval, new_candles, limit)
+
+    def save_state(self):
+        self.state_store.set_last_closed_position_time(self.symbol, self.last_closed_position_time)
+        self.state_store.save()
 
     def check_last_position_time(self):
+        # The cached close time can only be older than the real one, so if it is
+        # still inside the cooldown we can skip the REST round trip entirely.
+        if self.in_cooldown():
+            logging.info("Last closed position was less than 5 hours ago. Skipping trade.")
+            return False
+
         last_closed_position = self.data_fetcher.get_last_closed_position(self.symbol)
         if last_closed_position:
             last_closed_time = int(last_closed_position['updatedTime']) / 1000
+            self.last_closed_position_time = max(self.last_closed_position_time, last_closed_time)
             time_since_last_close = time.time() - last_closed_time
             if time_since_last_close < 18000:  # 5 hours = 18000 seconds
                 logging.info("Last closed position was less than 5 hours ago. Skipping trade.")
                 return False
         return True
 
+    def sync_managed_positions(self, open_positions, m15_df):
+        """
+        Hands newly opened positions to the position manager and drops the ones that are gone.
+        Exit levels come from the order that opened the position, or are recomputed from its
+        entry price (e.g. after a restart).
+        """
+        atr = self.risk_management.calculate_atr(m15_df)
+        open_ids = set()
+        managed_ids = self.position_manager.managed_ids(self.symbol)
+        for position in open_positions:
+            position_id = f"{self.symbol}:{position.get('positionIdx', 0)}"
+            open_ids.add(position_id)
+            if position_id in managed_ids:
+                continue
+
+            entry_price = float(position['avgPrice'])
+            trend = 'long' if position['side'] == 'Buy' else 'short'
+            stop_loss, take_profit = self.pending_exits.pop(self.symbol, None) or \
+                self.risk_management.calculate_exit_levels(entry_price, atr, trend)
+            self.position_manager.add_position(
+                position_id, self.symbol, position['side'], float(position['size']), entry_price,
+                stop_loss=stop_loss, take_profit=take_profit, trail_distance=atr * self.trailing_atr_multiplier,
+            )
+
+        for position_id in managed_ids - open_ids:
+            self.position_manager.remove_position(position_id)
+
+    def on_position_update(self, position):
+        """
+        Private stream callback: drops the managed position once its size reaches zero.
+        """
+        if position['symbol'] == self.symbol and float(position.get('size') or 0) == 0:
+            self.position_manager.remove_position(f"{self.symbol}:{position.get('positionIdx', 0)}")
+
+    def in_cooldown(self):
+        return time.time() - self.last_closed_position_time < 18000
+
+    def record_evaluation(self, outcome, signal=None, **fields):
+        """
+        Journals the result of one job() evaluation; `signal` ('buy'/'sell') is indexed as the record side.
+        """
+        if self.journal:
+            self.journal.record(self.symbol, 'evaluation', side=signal, outcome=outcome, **fields)
+
     # def close_position_if_trend_changed(self, trend):
     #     """
     #     Closes the open position if the trend has changed.
@@ -74,12 +207,13 @@ class TradingBot:
 
         # Fetch 15-minute data to determine trend and H1 data for confirmation
         logging.info("Fetching 15-minute (M15) data for trend detection...")
-        m15_data = self.data_fetcher.get_historical_data(self.symbol, '15', 400)
+        m15_data = self.fetch_candles('15', self.candle_limit)
         logging.info("Fetching 1-hour (H1) data for confirmation...")
         # h1_data = self.data_fetcher.get_historical_data(self.symbol, '60', 800)
 
         if not m15_data:
             logging.warning("Failed to fetch data for required timeframes.")
+            self.record_evaluation('no_data')
             return
 
         # Prepare dataframes
@@ -88,6 +222,10 @@ class TradingBot:
 
         # Fetch current price
         current_price = self.data_fetcher.get_real_time_price(self.symbol)
+        if current_price is None:
+            logging.warning("Failed to fetch real-time price.")
+            self.record_evaluation('no_price')
+            return
         logging.info(f"Real-time price for {self.symbol}: {current_price}")
 
         # Determine trend based on SMA-200 and SMA-90 on M15
@@ -104,14 +242,37 @@ class TradingBot:
         rsi = m15_df['rsi'].iloc[-1]
         logging.info(f"RSI: {rsi}")
 
+        context = {"current_price": current_price, "trend_ema": trendEMA, "trend_sma": trendSMA, "rsi": float(rsi)}
+
         # Check for open positions and close if trend has changed
         open_positions = self.data_fetcher.get_open_positions(self.symbol)
+        if open_positions is None:
+            logging.warning("Failed to fetch open positions. Skipping trade.")
+            self.record_evaluation('positions_unavailable', **context)
+            return
+        self.sync_managed_positions(open_positions, m15_df)
+        if not self.order_book_stream or self.order_book_stream.get_book(self.symbol) is None:
+            # No live streamed prices: at least check the exits against the polled price
+            self.position_manager.on_price(self.symbol, current_price, current_price)
         if open_positions:
             logging.info("An open position exists.")
+            self.record_evaluation('position_open', **context)
             return  # Skip trade entry since a position is still open
 
+        # A resting entry limit order has not filled yet; placing another would stack the position
+        open_orders = self.data_fetcher.get_open_orders(self.symbol)
+        if open_orders is None:
+            logging.warning("Failed to fetch open orders. Skipping trade.")
+            self.record_evaluation('orders_unavailable', **context)
+            return
+        if any(not order.get('reduceOnly') for order in open_orders):
+            logging.info("An entry order is still open.")
+            self.record_evaluation('order_pending', **context)
+            return
+
         # Check if sufficient time has passed since the last closed position
         if not self.check_last_position_time():
+            self.record_evaluation('cooldown', last_closed_position_time=self.last_closed_position_time, **context)
             return
 
         # Confirm trade entry using RSI or Bollinger Bands, passing the current price
@@ -127,23 +288,46 @@ class TradingBot:
                 qty=self.quantity,
                 current_price=current_price,
                 leverage=10,
+                stop_loss=stop_loss,
                 take_profit=take_profit
             )
 
+            self.record_evaluation('signal', signal=confirmation_signal, stop_loss=stop_loss,
+                                   take_profit=take_profit, order_placed=bool(order_result), **context)
             if order_result:
+                self.pending_exits[self.symbol] = (stop_loss, take_profit)
                 logging.info(f"Order successfully placed: {order_result}")
             else:
                 logging.error("Failed to place order.")
         else:
             logging.info("No trade signal generated.")
+            self.record_evaluation('no_signal', **context)
+
+    def run_iteration(self):
+        with self.data_fetcher.iteration_deadline(self.iteration_deadline):
+            self.profiler.run(self.job)
 
     def run(self):
-        self.job()  # Execute once immediately
-        schedule.every(10).seconds.do(self.job)
+        # `kill -USR1 <pid>` profiles the next PROFILE_ITERATIONS iterations without a restart
+        self.profiler.install_signal_handler()
+        self.run_iteration()  # Execute once immediately
+        schedule.every(10).seconds.do(self.run_iteration)
+        schedule.every(self.snapshot_interval).seconds.do(self.save_state)
+        # Reap limit orders older than 3 minutes from local state instead of waiting for a REST poll
+        schedule.every(30).seconds.do(self.data_fetcher.cancel_stale_orders, self.symbol)
 
-        while True:
-            schedule.run_pending()
-            time.sleep(1)
+        try:
+            while True:
+                schedule.run_pending()
+                time.sleep(1)
+        finally:
+            self.save_state()
+            if self.private_stream:
+                self.private_stream.stop()
+            if self.order_book_stream:
+                self.order_book_stream.stop()
+            if self.journal:
+                self.journal.close()
 
 if __name__ == "__main__":
     bot = TradingBot()